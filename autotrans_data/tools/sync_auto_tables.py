@@ -1,6 +1,8 @@
 import re
 import ast
+import sys
 import sqlite3
+import argparse
 from pathlib import Path
 from collections import defaultdict
 
@@ -9,6 +11,12 @@ RES_DIR = BASE / 'res'
 DB_PATH = BASE / 'autotrans.db'
 ENC_RES = 'utf-8'
 
+# 読み仮名の生成はアプリ本体と同じロジックを使う
+sys.path.insert(0, str(BASE.parent))
+from ffxi_reading import text_to_hiragana, text_to_romaji  # noqa: E402
+
+READING_TABLES = ('items', 'categories', 'auto_translates')
+
 ENTRY_PATTERN = re.compile(r'\[(\d+)\]\s*=\s*{([^}]*)}', re.S)
 FIELD_PATTERN = re.compile(r'(\w+)\s*=\s*("(?:[^"\\]|\\.)*")')
 
@@ -103,12 +111,83 @@ def build_auto_text(conn):
     conn.commit()
     print(f"Inserted {len(categories)} categories and {len(translates)} entries.")
 
+def _column_names(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+def build_readings(conn):
+    """ja の読み仮名(ひらがな)とローマ字の列を追加して埋める"""
+    print("Building readings...")
+    for table in READING_TABLES:
+        columns = _column_names(conn, table)
+        if 'ja_kana' not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN ja_kana TEXT NOT NULL DEFAULT ''")
+        if 'romaji' not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN romaji TEXT NOT NULL DEFAULT ''")
+        rows = conn.execute(f"SELECT rowid, ja FROM {table}").fetchall()
+        # 検索時と同じく小文字化したテキストの読みを保存する
+        updates = [
+            (text_to_hiragana((ja or '').lower()), text_to_romaji(ja or ''), rowid)
+            for rowid, ja in rows
+        ]
+        conn.executemany(f"UPDATE {table} SET ja_kana = ?, romaji = ? WHERE rowid = ?", updates)
+        print(f"  {table}: {len(updates)} readings")
+    conn.commit()
+
+def build_search_indexes(conn):
+    """テキスト列の B-tree インデックスと FTS5 (trigram) 全文検索テーブルを作成"""
+    print("Building search indexes...")
+    for table in ('items', 'auto_translates'):
+        for column in ('ja', 'en', 'ja_kana'):
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table}({column})")
+
+    conn.execute("DROP TABLE IF EXISTS items_fts")
+    conn.execute("""
+    CREATE VIRTUAL TABLE items_fts USING fts5(
+        ja, en, ja_kana, romaji,
+        content='items', content_rowid='id', tokenize='trigram'
+    )
+    """)
+    conn.execute("INSERT INTO items_fts(items_fts) VALUES('rebuild')")
+
+    # auto_translates は複合主キーで rowid が VACUUM で変わりうるため、キーを列として持たせる
+    conn.execute("DROP TABLE IF EXISTS auto_translates_fts")
+    conn.execute("""
+    CREATE VIRTUAL TABLE auto_translates_fts USING fts5(
+        ja, en, ja_kana, romaji,
+        category_id UNINDEXED, entry_id UNINDEXED,
+        tokenize='trigram'
+    )
+    """)
+    conn.execute("""
+    INSERT INTO auto_translates_fts (ja, en, ja_kana, romaji, category_id, entry_id)
+    SELECT ja, en, ja_kana, romaji, category_id, entry_id FROM auto_translates
+    """)
+    conn.commit()
+    print("Search indexes complete.")
+
 def main():
-    print(f"Generating database at {DB_PATH}...")
-    conn = init_db()
+    global DB_PATH
+    parser = argparse.ArgumentParser(description="Build autotrans.db from res/*.lua")
+    parser.add_argument('--upgrade', action='store_true',
+                        help="既存DBに読み仮名列と検索インデックスだけを追加する (res/*.lua 不要)")
+    parser.add_argument('--db', type=Path, default=DB_PATH, help="対象DBのパス")
+    args = parser.parse_args()
+    DB_PATH = args.db
+
+    if args.upgrade:
+        if not DB_PATH.exists():
+            parser.error(f"database not found: {DB_PATH}")
+        print(f"Upgrading database at {DB_PATH}...")
+        conn = sqlite3.connect(DB_PATH)
+    else:
+        print(f"Generating database at {DB_PATH}...")
+        conn = init_db()
     try:
-        build_items(conn)
-        build_auto_text(conn)
+        if not args.upgrade:
+            build_items(conn)
+            build_auto_text(conn)
+        build_readings(conn)
+        build_search_indexes(conn)
         print("Database generation complete.")
     finally:
         conn.close()
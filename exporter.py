@@ -127,6 +127,9 @@ def _resolve_template_folder(
             return ffxi_folder
 
     # 2. ローカルの編集用フォルダ (バックアップ)
+    # 起動時バックアップが data/edit を準備中なら使わない（画面側で完了まで操作を止めている）
+    if not storage.is_edit_ready():
+        return None
     local_folder = storage.character_folder("local", character_id)
     if local_folder.exists():
         return local_folder
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import sqlite3
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 from config import Config
 
@@ -14,7 +14,8 @@ _ROOT_DIR = Path(__file__).resolve().parent
 _DATA_BASE = _ROOT_DIR / "autotrans_data"
 _DB_PATH = _DATA_BASE / "autotrans.db"
 
-_TREE_CACHE: Optional[List[Dict[str, List[str]]]] = None
+_TREE_CACHE: Optional[List[Dict[str, Any]]] = None
+_SEARCH_FEATURES: Optional[Dict[str, bool]] = None
 _LANGUAGE_CODE = 0x01  # Japanese client marker for tokens
 
 
@@ -62,6 +63,7 @@ class AutoTranslateDecoder:
         self._item_map: Optional[Dict[int, str]] = None
         self._general_reverse: Optional[Dict[str, Tuple[int, int]]] = None
         self._item_reverse: Optional[Dict[str, int]] = None
+        self._variants: Optional[Dict[str, Tuple[str, ...]]] = None
 
     def _ensure_general(self) -> Dict[Tuple[int, int], str]:
         if self._general_map is None:
@@ -126,6 +128,32 @@ class AutoTranslateDecoder:
             self._item_reverse = reverse
         return self._item_reverse
 
+    def _ensure_variants(self) -> Dict[str, Tuple[str, ...]]:
+        """定型文・アイテム名から日英両方の表記への対応表を作成"""
+        if self._variants is None:
+            variants: Dict[str, Tuple[str, ...]] = {}
+            try:
+                conn = _get_db_connection()
+                cursor = conn.cursor()
+                for table in ("auto_translates", "items"):
+                    cursor.execute(f"SELECT ja, en FROM {table}")
+                    for ja_text, en_text in cursor.fetchall():
+                        pair = tuple(t for t in (ja_text, en_text) if t)
+                        for text in pair:
+                            variants.setdefault(text, pair)
+                conn.close()
+            except Exception:
+                pass
+            self._variants = variants
+        return self._variants
+
+    def token_variants(self, token_text: str) -> Tuple[str, ...]:
+        """Return every known spelling (ja/en) of an auto-translate token body."""
+        token_text = token_text.strip()
+        if not token_text:
+            return ()
+        return self._ensure_variants().get(token_text, (token_text,))
+
     def decode_bytes(self, raw: bytes) -> str:
         # Find null terminator while skipping tokens
         length = len(raw)
@@ -289,7 +317,11 @@ def encode_macro_text(text: str) -> bytes:
     return _DECODER.encode_text(text)
 
 
-def load_autotrans_tree() -> List[Dict[str, List[str]]]:
+def autotrans_variants(token_text: str) -> Tuple[str, ...]:
+    return _DECODER.token_variants(token_text)
+
+
+def load_autotrans_tree() -> List[Dict[str, Any]]:
     global _TREE_CACHE
     if _TREE_CACHE is not None:
         return _TREE_CACHE
@@ -305,11 +337,16 @@ def load_autotrans_tree() -> List[Dict[str, List[str]]]:
         cursor.execute(f"SELECT id, {lang_col} FROM categories ORDER BY id")
         categories = []
         for cat_id, cat_name in cursor.fetchall():
-            # エントリ取得
-            cursor.execute(f"SELECT {lang_col} FROM auto_translates WHERE category_id = ? ORDER BY entry_id", (cat_id,))
-            entries = [row[0] for row in cursor.fetchall()]
-            if entries:
-                categories.append({"name": cat_name, "entries": entries})
+            # エントリ取得（検索結果と突き合わせるため entry_id も持たせる）
+            cursor.execute(f"SELECT entry_id, {lang_col} FROM auto_translates WHERE category_id = ? ORDER BY entry_id", (cat_id,))
+            rows = cursor.fetchall()
+            if rows:
+                categories.append({
+                    "id": cat_id,
+                    "name": cat_name,
+                    "entries": [row[1] for row in rows],
+                    "entry_ids": [row[0] for row in rows],
+                })
         
         conn.close()
         _TREE_CACHE = categories
@@ -328,6 +365,131 @@ def load_autotrans_tree() -> List[Dict[str, List[str]]]:
         return _TREE_CACHE
 
 
+def _like_pattern(keyword: str) -> str:
+    escaped = keyword.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _search_features() -> Dict[str, bool]:
+    """Which optional search structures (sync_auto_tables.py --upgrade) the DB has."""
+    global _SEARCH_FEATURES
+    if _SEARCH_FEATURES is not None:
+        return _SEARCH_FEATURES
+    features = {"items_fts": False, "auto_translates_fts": False, "readings": False}
+    try:
+        conn = _get_db_connection()
+        try:
+            names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+            features["items_fts"] = "items_fts" in names
+            features["auto_translates_fts"] = "auto_translates_fts" in names
+            for table in ("items", "categories", "auto_translates"):
+                columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+                if "ja_kana" not in columns:
+                    break
+            else:
+                features["readings"] = True
+        finally:
+            conn.close()
+    except (FileNotFoundError, sqlite3.Error):
+        pass
+    _SEARCH_FEATURES = features
+    return features
+
+
+def query_items(keyword: str = "", after_id: int = -1, limit: int = 200) -> List[Tuple[int, str]]:
+    """Page through the ``items`` table by id (keyset paging) in the current language.
+
+    ``keyword`` matches the ja or en name (and the hiragana/romaji readings
+    when the DB has them). Pass the last id of the previous page as
+    ``after_id`` to fetch the next one.
+    """
+    lang_col = Config.get_language()
+    features = _search_features()
+    keyword = keyword.strip()
+    params: List[object] = []
+    if keyword and features["items_fts"] and len(keyword) >= 3:
+        # trigram FTS は3文字以上でインデックスを使える
+        sql = (
+            f"SELECT i.id, i.{lang_col} FROM items_fts f JOIN items i ON i.id = f.rowid "
+            f"WHERE items_fts MATCH ? AND i.id > ? AND i.{lang_col} != '' ORDER BY i.id LIMIT ?"
+        )
+        params.extend((_fts_phrase(keyword), after_id))
+    else:
+        sql = f"SELECT id, {lang_col} FROM items WHERE id > ? AND {lang_col} != ''"
+        params.append(after_id)
+        if keyword:
+            columns = ["ja", "en"] + (["ja_kana", "romaji"] if features["readings"] else [])
+            sql += " AND (" + " OR ".join(f"{col} LIKE ? ESCAPE '\\'" for col in columns) + ")"
+            params.extend([_like_pattern(keyword)] * len(columns))
+        sql += " ORDER BY id LIMIT ?"
+    params.append(int(limit))
+    try:
+        conn = _get_db_connection()
+    except FileNotFoundError:
+        return []
+    try:
+        return [(int(item_id), str(name)) for item_id, name in conn.execute(sql, params)]
+    except sqlite3.Error:
+        return []
+    finally:
+        conn.close()
+
+
+def _fts_phrase(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
+
+def match_auto_translates(keyword: str, reading: str = "") -> Optional[Set[Tuple[int, int]]]:
+    """``(category_id, entry_id)`` of auto-translates whose text in the current language contains ``keyword``.
+
+    In Japanese, entries whose hiragana reading contains ``reading`` or whose
+    romaji contains ``keyword`` match too. Returns None when the DB has no
+    ``auto_translates_fts`` or a term is too short for the trigram index, so
+    the caller can fall back to scanning the tree.
+    """
+    lang_col = Config.get_language()
+    terms = [(lang_col, keyword)]
+    if lang_col == "ja" and reading:
+        terms += [("ja_kana", reading), ("romaji", keyword)]
+    if not _search_features()["auto_translates_fts"] or any(len(text) < 3 for _, text in terms):
+        return None
+    query = " OR ".join(f"{column} : {_fts_phrase(text)}" for column, text in terms)
+    try:
+        conn = _get_db_connection()
+    except FileNotFoundError:
+        return None
+    try:
+        rows = conn.execute(
+            "SELECT category_id, entry_id FROM auto_translates_fts WHERE auto_translates_fts MATCH ?",
+            (query,),
+        )
+        return {(int(category_id), int(entry_id)) for category_id, entry_id in rows}
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+
+
+def load_readings() -> Dict[str, str]:
+    """Precomputed ``lower(ja) -> hiragana reading`` for categories and auto-translates (if built)."""
+    if not _search_features()["readings"]:
+        return {}
+    try:
+        conn = _get_db_connection()
+    except FileNotFoundError:
+        return {}
+    try:
+        readings: Dict[str, str] = {}
+        for table in ("categories", "auto_translates"):
+            for ja, kana in conn.execute(f"SELECT ja, ja_kana FROM {table} WHERE ja_kana != ''"):
+                readings[ja.lower()] = kana
+        return readings
+    except sqlite3.Error:
+        return {}
+    finally:
+        conn.close()
+
+
 def reload_dictionaries() -> None:
     """辞書をリロード（言語変更時に使用）
 
@@ -335,12 +497,14 @@ def reload_dictionaries() -> None:
     キャッシュされた辞書データをクリアし、次回アクセス時に
     新しい言語でデータを再読み込みします。
     """
-    global _TREE_CACHE
+    global _TREE_CACHE, _SEARCH_FEATURES
     _TREE_CACHE = None
+    _SEARCH_FEATURES = None
     _DECODER._general_map = None
     _DECODER._item_map = None
     _DECODER._general_reverse = None
     _DECODER._item_reverse = None
+    _DECODER._variants = None
 
 
 def normalize_to_current_language(text: str) -> str:
@@ -369,6 +533,10 @@ __all__ = [
     "decode_macro_bytes",
     "decode_macro_text",
     "encode_macro_text",
+    "autotrans_variants",
+    "query_items",
+    "match_auto_translates",
+    "load_readings",
     "AutoTranslateDecoder",
     "load_autotrans_tree",
     "reload_dictionaries",
@@ -0,0 +1,114 @@
+"""Reading (hiragana / romaji) helpers for Japanese auto-translate and item names.
+
+Shared by the Ctrl+T search in ``ui`` and the database build tool in
+``autotrans_data/tools``; pykakasi is optional.
+"""
+
+from __future__ import annotations
+
+# FFXI固有の読み方カスタム辞書
+# {漢字表記: ひらがな読み}
+_FFXI_READING_DICT = {
+    # 侍WS
+    "八之太刀": "はちのたち",
+    "燕飛": "えんぴ",
+    "月光": "げっこう",
+    "雪風": "ゆきかぜ",
+    "花車": "かしゃ",
+    "陽炎": "かげろう",
+    "嵐月": "らんげつ",
+    "断雲": "だんうん",
+    "天地": "てんち",
+    "春風": "はるかぜ",
+    "白虎": "びゃっこ",
+    "青龍": "せいりゅう",
+    "朱雀": "すざく",
+    "玄武": "げんぶ",
+    # 忍者忍術
+    "空蝉": "うつせみ",
+    "火遁": "かとん",
+    "水遁": "すいとん",
+    "風遁": "ふうとん",
+    "土遁": "どとん",
+    "雷遁": "らいとん",
+    "氷遁": "ひょうとん",
+    # 侍JA
+    "明鏡止水": "めいきょうしすい",
+    "黙想": "もくそう",
+    "八双": "はっそう",
+    "星眼": "せいがん",
+    "葉隠": "はがくれ",
+    "心眼": "しんがん",
+    # その他
+    "震天動地": "しんてんどうち",
+}
+
+# グローバルなpykakasiインスタンス（初期化コストが高いため1度だけ作成）
+_kakasi_instance = None
+
+
+def _get_kakasi():
+    global _kakasi_instance
+    if _kakasi_instance is None:
+        try:
+            import pykakasi
+            _kakasi_instance = pykakasi.kakasi()
+        except ImportError:
+            # pykakasiがインストールされていない場合はカタカナ変換のみ
+            _kakasi_instance = False
+    return _kakasi_instance
+
+
+def katakana_to_hiragana(text: str) -> str:
+    """カタカナをひらがなに変換"""
+    result = []
+    for char in text:
+        code = ord(char)
+        # カタカナ範囲: 0x30A1-0x30F6 → ひらがな: 0x3041-0x3096
+        if 0x30A1 <= code <= 0x30F6:
+            result.append(chr(code - 0x60))
+        else:
+            result.append(char)
+    return ''.join(result)
+
+
+def _apply_reading_dict(text: str) -> str:
+    # カスタム辞書で完全一致を優先チェック
+    for kanji, hiragana in _FFXI_READING_DICT.items():
+        if kanji in text:
+            # 辞書の単語を含む場合、その部分を置き換えて処理
+            text = text.replace(kanji, hiragana)
+    return text
+
+
+def text_to_hiragana(text: str) -> str:
+    """漢字・カタカナを含むテキストをひらがなに変換（読み仮名）
+    FFXI固有の読み方にも対応"""
+    text = _apply_reading_dict(text)
+    kakasi = _get_kakasi()
+    if kakasi is False:
+        # pykakasiが使えない場合はカタカナ→ひらがな変換のみ
+        return katakana_to_hiragana(text)
+
+    # 漢字・カタカナ・ひらがな すべてをひらがなに変換
+    try:
+        result = kakasi.convert(text)
+        return ''.join([item['hira'] for item in result])
+    except Exception:
+        # エラー時はカタカナ→ひらがな変換のみ
+        return katakana_to_hiragana(text)
+
+
+def text_to_romaji(text: str) -> str:
+    """テキストをヘボン式ローマ字に変換（pykakasi が無い場合は空文字）"""
+    kakasi = _get_kakasi()
+    if kakasi is False:
+        return ""
+    try:
+        result = kakasi.convert(_apply_reading_dict(text))
+        return ''.join([item['hepburn'] for item in result])
+    except Exception:
+        return ""
+
+
+__all__ = ["katakana_to_hiragana", "text_to_hiragana", "text_to_romaji"]
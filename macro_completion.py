@@ -0,0 +1,245 @@
+"""Completion index for the macro editor: commands, targets and action names.
+
+Each kind of candidate lives in its own prefix trie keyed by a normalised form
+(lower case, katakana folded to hiragana), so ``けある`` finds ``ケアル`` and
+``cure`` finds ``Cure IV``. Candidates are ranked by how often they appear in
+the loaded macros, then by their built-in order; the ranked list of a trie node
+is cached until the usage counts change.
+"""
+
+from __future__ import annotations
+
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from ffxi_reading import katakana_to_hiragana
+
+KIND_COMMAND = "command"
+KIND_TARGET = "target"
+KIND_MAGIC = "magic"
+KIND_JA = "ja"
+KIND_WS = "ws"
+KIND_PET = "pet"
+NAME_KINDS = (KIND_MAGIC, KIND_JA, KIND_WS, KIND_PET)
+
+# 引数に名前を取るコマンドと、補完する名前の種類
+COMMAND_KINDS = {
+    "/ma": KIND_MAGIC, "/magic": KIND_MAGIC,
+    "/nin": KIND_MAGIC, "/ninjutsu": KIND_MAGIC,
+    "/song": KIND_MAGIC, "/sing": KIND_MAGIC,
+    "/ja": KIND_JA, "/jobability": KIND_JA,
+    "/ws": KIND_WS, "/weaponskill": KIND_WS,
+    "/pet": KIND_PET,
+}
+
+# 候補として返す最大件数（ポップアップに並べる分だけ）
+DEFAULT_LIMIT = 50
+
+# 定型文 << >> の括弧は除外する
+_TARGET_CONTEXT = re.compile(r"(?<!<)<[A-Za-z0-9]*$")
+_COMMAND_CONTEXT = re.compile(r"^[ \t]*(/[^\s\"<>]*)$")
+_NAME_CONTEXT = re.compile(r"^[ \t]*(/[^\s\"<>]+)[ \t]+(\"?)([^\"<>]*)$")
+
+_LINE_COMMAND = re.compile(r"[ \t]*(/[^\s\"<>]+)")
+_QUOTED_ARGUMENT = re.compile(r"[ \t]*\"([^\"]*)\"")
+_TARGET_TOKEN = re.compile(r"(?<!<)<[A-Za-z0-9]+>(?!>)")
+
+
+def normalize_key(text: str) -> str:
+    return katakana_to_hiragana(text.lower())
+
+
+@dataclass(frozen=True)
+class CompletionContext:
+    """What is being typed at the cursor: the kind, where it starts in the line, and the prefix."""
+
+    kind: str
+    start: int
+    prefix: str
+    quoted: bool = False
+
+
+def find_context(line: str) -> Optional[CompletionContext]:
+    """Classify the text before the cursor; None when nothing should be completed."""
+    match = _TARGET_CONTEXT.search(line)
+    if match:
+        return CompletionContext(KIND_TARGET, match.start(), match.group())
+    match = _COMMAND_CONTEXT.match(line)
+    if match:
+        return CompletionContext(KIND_COMMAND, match.start(1), match.group(1))
+    match = _NAME_CONTEXT.match(line)
+    if match:
+        kind = COMMAND_KINDS.get(match.group(1).lower())
+        if kind is not None:
+            return CompletionContext(kind, match.start(3), match.group(3), bool(match.group(2)))
+    return None
+
+
+def _line_usage(line: str) -> Iterator[Tuple[str, str]]:
+    """``(kind, key)`` for every command, target and action name used in one macro line."""
+    for target in _TARGET_TOKEN.findall(line):
+        yield KIND_TARGET, target.lower()
+    match = _LINE_COMMAND.match(line)
+    if not match:
+        return
+    command = match.group(1).lower()
+    yield KIND_COMMAND, command
+    kind = COMMAND_KINDS.get(command)
+    if kind is None:
+        return
+    rest = line[match.end():]
+    quoted = _QUOTED_ARGUMENT.match(rest)
+    name = (quoted.group(1) if quoted else rest.split("<", 1)[0]).strip()
+    if name:
+        yield kind, normalize_key(name)
+
+
+def mine_usage(lines: Iterable[str]) -> Dict[str, Counter]:
+    """Count commands, targets and action names used in macro lines, per kind."""
+    usage: Dict[str, Counter] = {}
+    for line in lines:
+        if line:
+            for kind, key in _line_usage(line):
+                usage.setdefault(kind, Counter())[key] += 1
+    return usage
+
+
+class UsageTracker:
+    """Usage counts of a whole repository, kept up to date one macro at a time.
+
+    ``counts`` is the live ``kind -> Counter`` mapping handed to
+    :meth:`CompletionIndex.set_usage`; ``update`` adjusts it by the difference
+    between a macro's previous and current lines.
+    """
+
+    def __init__(self) -> None:
+        self.counts: Dict[str, Counter] = {}
+        self._by_macro: Dict[Hashable, Tuple[Tuple[str, str], ...]] = {}
+
+    @classmethod
+    def build(cls, macros: Iterable[Tuple[Hashable, Sequence[str]]]) -> "UsageTracker":
+        """Count ``(macro_key, lines)`` pairs; touches no shared state, so it may run on a worker."""
+        tracker = cls()
+        for macro_key, lines in macros:
+            tracker.update(macro_key, lines)
+        return tracker
+
+    def update(self, macro_key: Hashable, lines: Iterable[str]) -> bool:
+        """Re-count one macro; returns True when the totals changed."""
+        new = tuple(item for line in lines if line for item in _line_usage(line))
+        old = self._by_macro.get(macro_key, ())
+        if new == old:
+            return False
+        for kind, key in old:
+            counter = self.counts[kind]
+            counter[key] -= 1
+            if counter[key] <= 0:
+                del counter[key]
+        for kind, key in new:
+            self.counts.setdefault(kind, Counter())[key] += 1
+        if new:
+            self._by_macro[macro_key] = new
+        else:
+            self._by_macro.pop(macro_key, None)
+        return True
+
+
+class _PrefixTrie:
+    """Trie over normalised keys; each node's ranked candidate list is built on first use."""
+
+    def __init__(self) -> None:
+        self._children: List[Dict[str, int]] = [{}]
+        self._terminals: List[List[int]] = [[]]
+        # (表示文字列, 正規化キー, 既定の順位)
+        self._words: List[Tuple[str, str, int]] = []
+        self._seen: set = set()
+        self._ranked: Dict[Tuple[int, int], List[str]] = {}
+
+    def add(self, word: str, rank: int) -> None:
+        if not word or word in self._seen:
+            return
+        self._seen.add(word)
+        key = normalize_key(word)
+        node = 0
+        for ch in key:
+            nxt = self._children[node].get(ch)
+            if nxt is None:
+                nxt = len(self._children)
+                self._children[node][ch] = nxt
+                self._children.append({})
+                self._terminals.append([])
+            node = nxt
+        self._terminals[node].append(len(self._words))
+        self._words.append((word, key, rank))
+        self._ranked.clear()
+
+    def clear_cache(self) -> None:
+        self._ranked.clear()
+
+    def complete(self, prefix: str, usage: Callable[[str], int], limit: int) -> List[str]:
+        node = 0
+        for ch in normalize_key(prefix):
+            node = self._children[node].get(ch)
+            if node is None:
+                return []
+        ranked = self._ranked.get((node, limit))
+        if ranked is None:
+            ids: List[int] = []
+            stack = [node]
+            while stack:
+                current = stack.pop()
+                ids.extend(self._terminals[current])
+                stack.extend(self._children[current].values())
+            words = self._words
+            ids.sort(key=lambda i: (-usage(words[i][1]), words[i][2], len(words[i][0]), words[i][0]))
+            ranked = [words[i][0] for i in ids[:limit]]
+            self._ranked[(node, limit)] = ranked
+        return list(ranked)
+
+
+class CompletionIndex:
+    """Ranked prefix completion for every candidate kind."""
+
+    def __init__(
+        self,
+        commands: Sequence[str],
+        targets: Sequence[str],
+        names: Optional[Dict[str, Iterable[str]]] = None,
+    ) -> None:
+        self._tries: Dict[str, _PrefixTrie] = {}
+        self._usage: Dict[str, Counter] = {}
+        # このセッションで確定した補完の回数（マクロに保存される前から順位に効かせる）
+        self._accepted: Dict[str, Counter] = {}
+        groups = [(KIND_COMMAND, commands), (KIND_TARGET, targets)]
+        groups.extend((names or {}).items())
+        for kind, words in groups:
+            trie = self._tries.setdefault(kind, _PrefixTrie())
+            for rank, word in enumerate(words):
+                trie.add(word, rank)
+
+    def set_usage(self, usage: Dict[str, Counter]) -> None:
+        """Rank by ``usage`` (kept by reference, e.g. :attr:`UsageTracker.counts`)."""
+        self._usage = usage
+        self.usage_changed()
+
+    def usage_changed(self) -> None:
+        """Drop cached rankings after the usage counts were updated in place."""
+        for trie in self._tries.values():
+            trie.clear_cache()
+
+    def record_use(self, kind: str, word: str) -> None:
+        """Count an accepted completion so it ranks higher next time."""
+        self._accepted.setdefault(kind, Counter())[normalize_key(word)] += 1
+        trie = self._tries.get(kind)
+        if trie is not None:
+            trie.clear_cache()
+
+    def complete(self, context: CompletionContext, limit: int = DEFAULT_LIMIT) -> List[str]:
+        trie = self._tries.get(context.kind)
+        if trie is None:
+            return []
+        counts = self._usage.get(context.kind) or Counter()
+        accepted = self._accepted.get(context.kind) or Counter()
+        return trie.complete(context.prefix, lambda key: counts[key] + accepted[key], limit)
@@ -0,0 +1,104 @@
+"""Three-way merge between the last imported game state, the USER folder and local edits.
+
+``base`` is the snapshot taken at the previous import (or copy to the USER
+folder), ``remote`` is what ``ffxi_mcr`` parses from the USER folder now and
+``local`` is the live ``MacroRepository``. Sets whose digests show a change on
+only one side are resolved automatically; only macros edited differently on
+both sides are reported as conflicts.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, List, Literal, Tuple
+
+from model import HistoryPath, MacroHashTree, MacroSnapshot, _EMPTY_MACRO_SNAPSHOT
+
+Prefer = Literal["local", "remote"]
+
+
+@dataclass(frozen=True)
+class MergeConflict:
+    path: HistoryPath
+    base: Any
+    local: Any
+    remote: Any
+
+
+@dataclass
+class MergeResult:
+    remote_changes: List[Tuple[HistoryPath, Any]] = field(default_factory=list)
+    conflicts: List[MergeConflict] = field(default_factory=list)
+    unchanged_sets: int = 0
+    local_only_sets: int = 0
+
+    @property
+    def is_noop(self) -> bool:
+        return not self.remote_changes and not self.conflicts
+
+    def changes(self, prefer: Prefer = "local") -> List[Tuple[HistoryPath, Any]]:
+        """Changes to apply to the local repository for the given conflict policy."""
+        result = list(self.remote_changes)
+        if prefer == "remote":
+            result.extend((c.path, c.remote) for c in self.conflicts)
+        return result
+
+
+def _macro_at(tree: MacroHashTree, book_idx: int, set_idx: int, side: str, macro_idx: int) -> MacroSnapshot:
+    seq = getattr(tree.books[book_idx].sets[set_idx], side)
+    if macro_idx >= len(seq):
+        return _EMPTY_MACRO_SNAPSHOT
+    macro = seq[macro_idx]
+    return macro if isinstance(macro, MacroSnapshot) else macro.snapshot()
+
+
+def merge_three_way(base: MacroHashTree, local: MacroHashTree, remote: MacroHashTree) -> MergeResult:
+    result = MergeResult()
+    for book_idx in range(40):
+        for set_idx in range(10):
+            b = base.set_digest(book_idx, set_idx)
+            l = local.set_digest(book_idx, set_idx)
+            r = remote.set_digest(book_idx, set_idx)
+            if l == r or r == b:
+                # 両側同じ、またはゲーム側が無変更 → ローカルのまま
+                if l == r:
+                    result.unchanged_sets += 1
+                else:
+                    result.local_only_sets += 1
+                continue
+            for side in ("ctrl", "alt"):
+                for macro_idx in range(10):
+                    mb = base.macro_digest(book_idx, set_idx, side, macro_idx)
+                    ml = local.macro_digest(book_idx, set_idx, side, macro_idx)
+                    mr = remote.macro_digest(book_idx, set_idx, side, macro_idx)
+                    if ml == mr or mr == mb:
+                        continue
+                    path = ("macro", book_idx, set_idx, side, macro_idx)
+                    remote_macro = _macro_at(remote, book_idx, set_idx, side, macro_idx)
+                    if ml == mb:
+                        result.remote_changes.append((path, remote_macro))
+                    else:
+                        result.conflicts.append(
+                            MergeConflict(
+                                path,
+                                _macro_at(base, book_idx, set_idx, side, macro_idx),
+                                _macro_at(local, book_idx, set_idx, side, macro_idx),
+                                remote_macro,
+                            )
+                        )
+
+        # mcr.ttl に書かれていない (空) Book名はローカルを維持する
+        bn = base.books[book_idx].name
+        ln = local.books[book_idx].name
+        rn = remote.books[book_idx].name
+        if not rn or rn == ln or rn == bn:
+            continue
+        path = ("book_name", book_idx)
+        if ln == bn:
+            result.remote_changes.append((path, rn))
+        else:
+            result.conflicts.append(MergeConflict(path, bn, ln, rn))
+    return result
+
+
+__all__ = ["MergeConflict", "MergeResult", "merge_three_way"]
@@ -4,7 +4,7 @@ import sys
 from PyQt6.QtWidgets import QApplication
 
 from config import Config
-from storage import backup_and_prepare_edit, get_theme
+from storage import get_theme
 from ui import VanaMacroUI
 from ui_theme import apply_theme
 
@@ -12,12 +12,6 @@ from ui_theme import apply_theme
 if __name__ == "__main__":
     # 設定を読み込み
     Config.load()
-    
-    backed_ids = backup_and_prepare_edit()
-    if backed_ids:
-        print(f"バックアップ準備完了: {backed_ids}")
-    else:
-        print("注: FFXI USER フォルダが見つからず、バックアップをスキップしました。")
 
     app = QApplication(sys.argv)
 
@@ -27,4 +21,6 @@ if __name__ == "__main__":
 
     window = VanaMacroUI()
     window.show()
+    # USER フォルダのバックアップはウィンドウ表示後にバックグラウンドで実行
+    window.start_startup_backup()
     sys.exit(app.exec())
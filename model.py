@@ -1,18 +1,31 @@
 from __future__ import annotations
 
+from bisect import bisect_left, insort
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Literal, Optional, Dict, Any
+from typing import Callable, List, Literal, Optional, Dict, Any, Tuple, Deque, Iterator, Set
 import datetime
+import hashlib
 import json
+import re
 import tempfile
 
 try:
-    from ffxi_autotrans import decode_macro_text
+    from ffxi_autotrans import decode_macro_text, _SENTINEL_CHAR
 except Exception:
+    _SENTINEL_CHAR = "\uf8f1"
+
     def decode_macro_text(text: str) -> str:  # type: ignore
         return text
 
+try:
+    from ffxi_autotrans import autotrans_variants
+except Exception:
+    def autotrans_variants(token_text: str) -> Tuple[str, ...]:  # type: ignore
+        return (token_text,)
+
 Side = Literal["ctrl", "alt"]
 
 
@@ -30,6 +43,48 @@ def _six_lines(lines: Optional[List[str]]) -> List[str]:
     return normalized
 
 
+def _needs_decode(raw_text: str) -> bool:
+    """Return True when raw JSON text may contain undecoded auto-translate tokens."""
+    # ensure_ascii=True で書かれたJSONではセンチネルが \uf8f1 にエスケープされる
+    return (
+        _SENTINEL_CHAR in raw_text
+        or "\\uf8f1" in raw_text
+        or "\\uF8F1" in raw_text
+    )
+
+
+@dataclass(frozen=True)
+class MacroSnapshot:
+    """Immutable view of a macro; safe to share between clipboard, history and repo."""
+
+    name: str = ""
+    lines: Tuple[str, ...] = ("", "", "", "", "", "")
+
+    def to_macro(self) -> "Macro":
+        return Macro(self.name, list(self.lines))
+
+
+@dataclass(frozen=True)
+class MacroSetSnapshot:
+    """Immutable set whose ctrl/alt tuples share MacroSnapshot instances."""
+
+    name: str = ""
+    ctrl: Tuple[MacroSnapshot, ...] = ()
+    alt: Tuple[MacroSnapshot, ...] = ()
+
+
+@dataclass(frozen=True)
+class MacroBookSnapshot:
+    """Immutable book built from shared MacroSetSnapshot instances."""
+
+    name: str = ""
+    sets: Tuple[MacroSetSnapshot, ...] = ()
+
+
+# 空マクロは大多数を占めるため単一インスタンスを共有する
+_EMPTY_MACRO_SNAPSHOT = MacroSnapshot()
+
+
 @dataclass
 class Macro:
     name: str = ""
@@ -39,16 +94,27 @@ class Macro:
         return {"name": self.name, "lines": _six_lines(self.lines)}
 
     @staticmethod
-    def from_dict(data: Dict[str, Any]) -> "Macro":
+    def from_dict(data: Dict[str, Any], decode: bool = True) -> "Macro":
         if not isinstance(data, dict):
             return Macro()
         name = str(data.get("name", ""))
-        lines = [decode_macro_text(line) for line in _six_lines(data.get("lines"))]
+        lines = _six_lines(data.get("lines"))
+        if decode:
+            lines = [
+                decode_macro_text(line) if _SENTINEL_CHAR in line else line
+                for line in lines
+            ]
         return Macro(name=name, lines=lines)
 
     def clone(self) -> "Macro":
         return Macro(self.name, list(self.lines))
 
+    def snapshot(self) -> MacroSnapshot:
+        lines = tuple(self.lines)
+        if not self.name and lines == _EMPTY_MACRO_SNAPSHOT.lines:
+            return _EMPTY_MACRO_SNAPSHOT
+        return MacroSnapshot(self.name, lines)
+
 
 @dataclass
 class MacroSet:
@@ -74,7 +140,7 @@ class MacroSet:
         }
 
     @staticmethod
-    def from_dict(data: Dict[str, Any]) -> "MacroSet":
+    def from_dict(data: Dict[str, Any], decode: bool = True) -> "MacroSet":
         if not isinstance(data, dict):
             return MacroSet()
         name = str(data.get("name", ""))
@@ -82,7 +148,7 @@ class MacroSet:
         def _load_list(key: str) -> List[Macro]:
             raw = data.get(key, [{} for _ in range(10)])
             macros = [
-                Macro.from_dict(entry) if isinstance(entry, dict) else Macro()
+                Macro.from_dict(entry, decode) if isinstance(entry, dict) else Macro()
                 for entry in raw[:10]
             ]
             while len(macros) < 10:
@@ -93,6 +159,25 @@ class MacroSet:
         alt = _load_list("alt")
         return MacroSet(name=name, ctrl=ctrl, alt=alt)
 
+    def snapshot(self) -> MacroSetSnapshot:
+        return MacroSetSnapshot(
+            name=self.name,
+            ctrl=tuple(m.snapshot() for m in self.ctrl),
+            alt=tuple(m.snapshot() for m in self.alt),
+        )
+
+    @staticmethod
+    def from_snapshot(snap: MacroSetSnapshot) -> "MacroSet":
+        """Materialize a snapshot without re-decoding or deep-copying its lines."""
+
+        def _load_list(items: Tuple[MacroSnapshot, ...]) -> List[Macro]:
+            macros = [m.to_macro() for m in items[:10]]
+            while len(macros) < 10:
+                macros.append(Macro())
+            return macros
+
+        return MacroSet(name=snap.name, ctrl=_load_list(snap.ctrl), alt=_load_list(snap.alt))
+
 
 @dataclass
 class MacroBook:
@@ -103,19 +188,469 @@ class MacroBook:
         return {"name": self.name, "sets": [s.to_dict() for s in self.sets]}
 
     @staticmethod
-    def from_dict(data: Dict[str, Any]) -> "MacroBook":
+    def from_dict(data: Dict[str, Any], decode: bool = True) -> "MacroBook":
         if not isinstance(data, dict):
             return MacroBook()
         name = str(data.get("name", ""))
         raw_sets = data.get("sets", [{} for _ in range(10)])
         sets: List[MacroSet] = [
-            MacroSet.from_dict(entry) if isinstance(entry, dict) else MacroSet()
+            MacroSet.from_dict(entry, decode) if isinstance(entry, dict) else MacroSet()
             for entry in raw_sets[:10]
         ]
         while len(sets) < 10:
             sets.append(MacroSet())
         return MacroBook(name=name, sets=sets)
 
+    def snapshot(self) -> MacroBookSnapshot:
+        return MacroBookSnapshot(name=self.name, sets=tuple(s.snapshot() for s in self.sets))
+
+    @staticmethod
+    def from_snapshot(snap: MacroBookSnapshot) -> "MacroBook":
+        sets = [MacroSet.from_snapshot(entry) for entry in snap.sets[:10]]
+        while len(sets) < 10:
+            sets.append(MacroSet())
+        return MacroBook(name=snap.name, sets=sets)
+
+
+# 変更箇所のアドレス:
+#   ("macro", book, set, side, slot) -> MacroSnapshot
+#   ("set_name", book, set)         -> str
+#   ("book_name", book)             -> str
+HistoryPath = Tuple[Any, ...]
+
+
+@dataclass(frozen=True)
+class HistoryChange:
+    path: HistoryPath
+    before: Any
+    after: Any
+
+
+@dataclass
+class HistoryEntry:
+    label: str
+    changes: List[HistoryChange] = field(default_factory=list)
+
+
+class MacroHistory:
+    """Bounded undo/redo stacks that store per-macro deltas instead of full copies.
+
+    Each entry only holds the snapshots of the macros/names that actually changed,
+    so recording, undoing and redoing cost O(delta). Consecutive records inside a
+    ``begin``/``end`` pair are merged into a single entry.
+    """
+
+    def __init__(self, max_entries: int = 100, max_changes: int = 20000) -> None:
+        self.max_entries = max_entries
+        self.max_changes = max_changes
+        self._undo: Deque[HistoryEntry] = deque()
+        self._redo: List[HistoryEntry] = []
+        self._pending: Optional[HistoryEntry] = None
+        self._pending_index: Dict[HistoryPath, int] = {}
+        self._depth = 0
+        self._change_count = 0
+
+    def begin(self, label: str) -> None:
+        if self._depth == 0:
+            self._pending = HistoryEntry(label)
+            self._pending_index = {}
+        self._depth += 1
+
+    def end(self) -> None:
+        if self._depth == 0:
+            return
+        self._depth -= 1
+        if self._depth == 0:
+            entry = self._pending
+            self._pending = None
+            self._pending_index = {}
+            if entry is not None and entry.changes:
+                self._push(entry)
+
+    def record(self, path: HistoryPath, before: Any, after: Any, label: str = "edit") -> None:
+        if before == after:
+            return
+        pending = self._pending
+        if pending is None:
+            self._push(HistoryEntry(label, [HistoryChange(path, before, after)]))
+            return
+        # 同一バッチ内で同じ箇所が複数回変わった場合は最初の before を保持して統合する
+        idx = self._pending_index.get(path)
+        if idx is None:
+            self._pending_index[path] = len(pending.changes)
+            pending.changes.append(HistoryChange(path, before, after))
+        else:
+            first = pending.changes[idx]
+            pending.changes[idx] = HistoryChange(path, first.before, after)
+
+    def _push(self, entry: HistoryEntry) -> None:
+        self._redo.clear()
+        self._undo.append(entry)
+        self._change_count += len(entry.changes)
+        while self._undo and (
+            len(self._undo) > self.max_entries
+            or (self._change_count > self.max_changes and len(self._undo) > 1)
+        ):
+            dropped = self._undo.popleft()
+            self._change_count -= len(dropped.changes)
+
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    def pop_undo(self) -> Optional[HistoryEntry]:
+        if not self._undo:
+            return None
+        entry = self._undo.pop()
+        self._change_count -= len(entry.changes)
+        self._redo.append(entry)
+        return entry
+
+    def pop_redo(self) -> Optional[HistoryEntry]:
+        if not self._redo:
+            return None
+        entry = self._redo.pop()
+        self._undo.append(entry)
+        self._change_count += len(entry.changes)
+        return entry
+
+    def clear(self) -> None:
+        self._undo.clear()
+        self._redo.clear()
+        self._change_count = 0
+
+
+MacroAddress = Tuple[int, int, str, int]  # (book, set, side, slot)
+
+_AUTOTRANS_BODY = re.compile(r"<<(.+?)>>")
+_WORD_TOKEN = re.compile(r"\w+")
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    book_idx: int
+    set_idx: int
+    side: Side
+    macro_idx: int
+    name: str
+    line_idx: int  # -1 ならマクロ名で一致
+    text: str
+
+
+@dataclass(frozen=True)
+class ReplaceEdit:
+    book_idx: int
+    set_idx: int
+    side: Side
+    macro_idx: int
+    line_idx: int  # -1 ならマクロ名
+    before: str
+    after: str
+
+
+ReplaceMode = Literal["plain", "regex", "autotrans"]
+
+
+class MacroSearchIndex:
+    """Incrementally maintained inverted index over macro names and lines.
+
+    Every non-empty macro is reduced to one lower-cased document (name, lines and
+    the other-language spelling of each ``<<auto-translate>>`` token). Posting
+    lists map trigrams and whole word tokens to macro addresses; only the
+    document text itself is kept per macro; terms shorter than a trigram are
+    checked directly against it. Candidates are verified in address order and
+    the scan stops as soon as ``limit`` hits are found.
+    """
+
+    GRAM = 3
+
+    def __init__(self) -> None:
+        self._grams: Dict[str, Set[MacroAddress]] = {}
+        self._tokens: Dict[str, Set[MacroAddress]] = {}
+        self._docs: Dict[MacroAddress, str] = {}
+        # 登録済みアドレスの昇順リスト（候補が多いときはこれを先頭から走査する）
+        self._order: List[MacroAddress] = []
+
+    @staticmethod
+    def _document(name: str, lines: List[str]) -> str:
+        parts = [name]
+        parts.extend(lines)
+        for line in lines:
+            if "<<" not in line:
+                continue
+            for body in _AUTOTRANS_BODY.findall(line):
+                parts.extend(v for v in autotrans_variants(body) if v != body.strip())
+        return "\n".join(p for p in parts if p).lower()
+
+    @classmethod
+    def _grams_of(cls, text: str) -> Set[str]:
+        size = cls.GRAM
+        grams: Set[str] = set()
+        for part in text.split("\n"):
+            grams.update(part[i : i + size] for i in range(len(part) - size + 1))
+        return grams
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def update(self, address: MacroAddress, name: str, lines: List[str]) -> None:
+        doc = self._document(name, lines)
+        old = self._docs.get(address)
+        if old == doc:
+            return
+        if not doc:
+            self.remove(address)
+            return
+        if old is None:
+            insort(self._order, address)
+            old_grams: Set[str] = set()
+            old_tokens: Set[str] = set()
+        else:
+            old_grams = self._grams_of(old)
+            old_tokens = set(_WORD_TOKEN.findall(old))
+        self._docs[address] = doc
+        # 変わったキーだけ投稿リストを付け替える
+        new_grams = self._grams_of(doc)
+        new_tokens = set(_WORD_TOKEN.findall(doc))
+        self._unlink(address, old_grams - new_grams, self._grams)
+        self._unlink(address, old_tokens - new_tokens, self._tokens)
+        for gram in new_grams - old_grams:
+            self._grams.setdefault(gram, set()).add(address)
+        for token in new_tokens - old_tokens:
+            self._tokens.setdefault(token, set()).add(address)
+
+    def remove(self, address: MacroAddress) -> None:
+        doc = self._docs.pop(address, None)
+        if doc is None:
+            return
+        # 投稿リストからの削除に使うキーは文書から作り直す（文書ごとに集合を持たない）
+        self._unlink(address, self._grams_of(doc), self._grams)
+        self._unlink(address, set(_WORD_TOKEN.findall(doc)), self._tokens)
+        self._order.pop(bisect_left(self._order, address))
+
+    @staticmethod
+    def _unlink(address: MacroAddress, keys: Set[str], postings: Dict[str, Set[MacroAddress]]) -> None:
+        for key in keys:
+            bucket = postings.get(key)
+            if bucket is not None:
+                bucket.discard(address)
+                if not bucket:
+                    del postings[key]
+
+    def _in_order(self, groups: Optional[List[Set[MacroAddress]]]) -> Iterator[MacroAddress]:
+        """Yield the union of ``groups`` in address order (every document when None)."""
+        if groups is None:
+            yield from self._order
+        elif not groups:
+            return
+        elif sum(len(g) for g in groups) * 8 < len(self._order):
+            yield from sorted(set().union(*groups))
+        else:
+            # 候補が多いときは全体の並びを走査して、和集合や並べ替えを作らない
+            for address in self._order:
+                if any(address in g for g in groups):
+                    yield address
+
+    def query(self, text: str, limit: Optional[int] = None) -> List[MacroAddress]:
+        """Return addresses whose document contains every whitespace-separated term.
+
+        Whole-token matches are ranked ahead of plain substring matches.
+        """
+        terms = [t for t in text.lower().split() if t]
+        if not terms:
+            return []
+        # 3文字以上の語はトライグラムの投稿リストで絞り込む（積集合は作らず、所属を確認するだけ）
+        buckets: List[Set[MacroAddress]] = []
+        for gram in {t[i : i + self.GRAM] for t in terms for i in range(len(t) - self.GRAM + 1)}:
+            bucket = self._grams.get(gram)
+            if not bucket:
+                return []
+            buckets.append(bucket)
+        buckets.sort(key=len)
+        source = buckets[:1] if buckets else None
+        exact = [self._tokens[t] for t in terms if t in self._tokens]
+        docs = self._docs
+
+        def accept(address: MacroAddress) -> bool:
+            if not all(address in bucket for bucket in buckets):
+                return False
+            doc = docs[address]
+            return all(t in doc for t in terms)
+
+        matched: List[MacroAddress] = []
+        if limit is not None and limit <= 0:
+            return matched
+        # 単語として一致するマクロを先に、部分一致のマクロを後に、上限に達した時点で打ち切る
+        for address in self._in_order(exact):
+            if accept(address):
+                matched.append(address)
+                if limit is not None and len(matched) >= limit:
+                    return matched
+        for address in self._in_order(source):
+            if not any(address in g for g in exact) and accept(address):
+                matched.append(address)
+                if limit is not None and len(matched) >= limit:
+                    return matched
+        return matched
+
+
+_DIGEST_SIZE = 16
+
+
+def _digest(*parts: Any) -> bytes:
+    h = hashlib.blake2b(digest_size=_DIGEST_SIZE)
+    for part in parts:
+        if isinstance(part, bytes):
+            h.update(part)
+        else:
+            h.update(str(part).encode("utf-8"))
+        h.update(b"\x1f")
+    return h.digest()
+
+
+class MacroHashTree:
+    """Merkle-style digests per macro, set, book and character.
+
+    Works over anything shaped like the model (``MacroBook`` lists or
+    ``MacroBookSnapshot`` tuples). Digests are computed lazily and cached; the
+    owning repository calls :meth:`invalidate_macro` / :meth:`invalidate_book`
+    on edits so only the touched path is recomputed. Set digests cover macro
+    content only, so sets compare equal against mcr*.dat data (which has no set
+    names); names are folded into the book digest.
+    """
+
+    def __init__(self, books: Any) -> None:
+        self.books = books
+        self._macro: Dict[MacroAddress, bytes] = {}
+        self._set: Dict[Tuple[int, int], bytes] = {}
+        self._book: Dict[int, bytes] = {}
+        self._root: Optional[bytes] = None
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any]) -> "MacroHashTree":
+        """Build a static tree from a ``books`` payload (saved JSON or parse_mcr_dir output)."""
+        return cls(books_snapshot_from_payload(payload))
+
+    def invalidate_macro(self, book_idx: int, set_idx: int, side: Side, macro_idx: int) -> None:
+        self._macro.pop((book_idx, set_idx, side, macro_idx), None)
+        self._set.pop((book_idx, set_idx), None)
+        self._book.pop(book_idx, None)
+        self._root = None
+
+    def invalidate_book(self, book_idx: int) -> None:
+        self._book.pop(book_idx, None)
+        self._root = None
+
+    def invalidate_all(self) -> None:
+        self._macro.clear()
+        self._set.clear()
+        self._book.clear()
+        self._root = None
+
+    def _macro_obj(self, address: MacroAddress) -> Any:
+        book_idx, set_idx, side, macro_idx = address
+        seq = getattr(self.books[book_idx].sets[set_idx], side)
+        return seq[macro_idx] if macro_idx < len(seq) else _EMPTY_MACRO_SNAPSHOT
+
+    def macro_digest(self, book_idx: int, set_idx: int, side: Side, macro_idx: int) -> bytes:
+        address = (book_idx, set_idx, side, macro_idx)
+        digest = self._macro.get(address)
+        if digest is None:
+            macro = self._macro_obj(address)
+            lines = _six_lines(list(macro.lines))
+            digest = _EMPTY_MACRO_DIGEST if not macro.name and not any(lines) else _digest(macro.name, *lines)
+            self._macro[address] = digest
+        return digest
+
+    def set_digest(self, book_idx: int, set_idx: int) -> bytes:
+        key = (book_idx, set_idx)
+        digest = self._set.get(key)
+        if digest is None:
+            digest = _digest(
+                *(
+                    self.macro_digest(book_idx, set_idx, side, macro_idx)
+                    for side in ("ctrl", "alt")
+                    for macro_idx in range(10)
+                )
+            )
+            self._set[key] = digest
+        return digest
+
+    def book_digest(self, book_idx: int) -> bytes:
+        digest = self._book.get(book_idx)
+        if digest is None:
+            book = self.books[book_idx]
+            parts: List[Any] = [book.name]
+            for set_idx in range(10):
+                parts.append(book.sets[set_idx].name)
+                parts.append(self.set_digest(book_idx, set_idx))
+            digest = _digest(*parts)
+            self._book[book_idx] = digest
+        return digest
+
+    def root_digest(self) -> bytes:
+        if self._root is None:
+            self._root = _digest(*(self.book_digest(b) for b in range(40)))
+        return self._root
+
+    def diff(self, other: "MacroHashTree", include_names: bool = True) -> List[HistoryPath]:
+        """List the paths that differ, descending only into subtrees whose digests differ.
+
+        Paths use the same shape as undo history: ``("macro", b, s, side, i)``,
+        ``("set_name", b, s)`` and ``("book_name", b)``.
+        """
+        changed: List[HistoryPath] = []
+        if include_names and self.root_digest() == other.root_digest():
+            return changed
+        for book_idx in range(40):
+            if include_names and self.book_digest(book_idx) == other.book_digest(book_idx):
+                continue
+            for set_idx in range(10):
+                changed.extend(self.diff_set(other, book_idx, set_idx))
+                if include_names and self.books[book_idx].sets[set_idx].name != other.books[book_idx].sets[set_idx].name:
+                    changed.append(("set_name", book_idx, set_idx))
+            if include_names and self.books[book_idx].name != other.books[book_idx].name:
+                changed.append(("book_name", book_idx))
+        return changed
+
+    def diff_set(self, other: "MacroHashTree", book_idx: int, set_idx: int) -> List[HistoryPath]:
+        if self.set_digest(book_idx, set_idx) == other.set_digest(book_idx, set_idx):
+            return []
+        return [
+            ("macro", book_idx, set_idx, side, macro_idx)
+            for side in ("ctrl", "alt")
+            for macro_idx in range(10)
+            if self.macro_digest(book_idx, set_idx, side, macro_idx)
+            != other.macro_digest(book_idx, set_idx, side, macro_idx)
+        ]
+
+
+_EMPTY_MACRO_DIGEST = _digest("", "", "", "", "", "", "")
+
+
+def books_snapshot_from_payload(payload: Any) -> Tuple[MacroBookSnapshot, ...]:
+    """Turn a ``{"books": [...]}`` payload into 40 immutable book snapshots."""
+    books_raw = payload.get("books") if isinstance(payload, dict) else None
+    books: List[MacroBookSnapshot] = []
+    if isinstance(books_raw, list):
+        for entry in books_raw[:40]:
+            book = MacroBook.from_dict(entry, decode=False) if isinstance(entry, dict) else MacroBook()
+            books.append(book.snapshot())
+    empty = MacroBook().snapshot()
+    while len(books) < 40:
+        books.append(empty)
+    return tuple(books)
+
+
+def _file_stamp(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
 
 class MacroRepository:
     """Manage 40 books x 10 sets x (ctrl/alt) x 10 macros per slot for a character."""
@@ -134,6 +669,17 @@ class MacroRepository:
             MacroBook() for _ in range(40)
         ]
         self._clipboard: Optional[Macro] = None
+        self.history = MacroHistory()
+        self._search_index: Optional[MacroSearchIndex] = None
+        # 別スレッドで索引を作っている間に変更されたマクロ（取り込み時に反映する）
+        self._index_pending: Optional[Set[MacroAddress]] = None
+        # 一括変更中は索引の更新を溜め、終了時にマクロごと1回だけ反映する
+        self._index_deferred: Optional[Set[MacroAddress]] = None
+        self._macro_listeners: List[Callable[[MacroAddress], None]] = []
+        self._hash_tree: Optional[MacroHashTree] = None
+        # 保存されていない変更があるか / 最後に読み書きしたJSONの (mtime_ns, size)
+        self.dirty = False
+        self._disk_stamp: Optional[Tuple[int, int]] = None
 
     # -------------------------- helpers --------------------------
     @staticmethod
@@ -148,16 +694,132 @@ class MacroRepository:
         self.base_dir.mkdir(parents=True, exist_ok=True)
         return self.base_dir / f"macros_{self.character_id}.json"
 
+    def _macro_changed(self, book_idx: int, set_idx: int, side: Side, macro_idx: int) -> None:
+        """Keep derived structures in step with an edited macro."""
+        self.dirty = True
+        if self._hash_tree is not None:
+            self._hash_tree.invalidate_macro(book_idx, set_idx, side, macro_idx)
+        if self._index_deferred is not None:
+            self._index_deferred.add((book_idx, set_idx, side, macro_idx))
+        elif self._search_index is not None:
+            macro = self.books[book_idx].sets[set_idx].get(side, macro_idx)
+            self._search_index.update((book_idx, set_idx, side, macro_idx), macro.name, macro.lines)
+        elif self._index_pending is not None:
+            self._index_pending.add((book_idx, set_idx, side, macro_idx))
+        for listener in self._macro_listeners:
+            listener((book_idx, set_idx, side, macro_idx))
+
+    def add_macro_listener(self, callback: Callable[[MacroAddress], None]) -> None:
+        """Call ``callback(address)`` whenever a macro changes (for caches kept outside the model)."""
+        self._macro_listeners.append(callback)
+
+    def _name_changed(self, book_idx: int) -> None:
+        self.dirty = True
+        if self._hash_tree is not None:
+            self._hash_tree.invalidate_book(book_idx)
+
+    def _assign(self, path: HistoryPath, value: Any) -> None:
+        """Write a history value into the live model without recording it."""
+        kind = path[0]
+        if kind == "macro":
+            _, book_idx, set_idx, side, macro_idx = path
+            macro = self.books[book_idx].sets[set_idx].get(side, macro_idx)
+            macro.name = value.name
+            macro.lines = list(value.lines)
+            self._macro_changed(book_idx, set_idx, side, macro_idx)
+        elif kind == "set_name":
+            self.books[path[1]].sets[path[2]].name = value
+            self._name_changed(path[1])
+        elif kind == "book_name":
+            self.books[path[1]].name = value
+            self._name_changed(path[1])
+
+    def _assign_set(self, book_idx: int, set_idx: int, snap: MacroSetSnapshot) -> None:
+        """Overwrite one set in place, recording only the macros that differ."""
+        macro_set = self.books[book_idx].sets[set_idx]
+        for side in ("ctrl", "alt"):
+            target = macro_set._target(side)
+            incoming = getattr(snap, side)
+            for macro_idx in range(10):
+                new = incoming[macro_idx] if macro_idx < len(incoming) else _EMPTY_MACRO_SNAPSHOT
+                old = target[macro_idx].snapshot()
+                if old != new:
+                    path = ("macro", book_idx, set_idx, side, macro_idx)
+                    self._assign(path, new)
+                    self.history.record(path, old, new)
+        if macro_set.name != snap.name:
+            self.history.record(("set_name", book_idx, set_idx), macro_set.name, snap.name)
+            macro_set.name = snap.name
+            self._name_changed(book_idx)
+
+    def _assign_book(self, book_idx: int, snap: MacroBookSnapshot) -> None:
+        book = self.books[book_idx]
+        for set_idx in range(10):
+            incoming = snap.sets[set_idx] if set_idx < len(snap.sets) else MacroSetSnapshot()
+            self._assign_set(book_idx, set_idx, incoming)
+        if book.name != snap.name:
+            self.history.record(("book_name", book_idx), book.name, snap.name)
+            book.name = snap.name
+            self._name_changed(book_idx)
+
+    @contextmanager
+    def batch(self, label: str) -> Iterator[None]:
+        """Group every change made inside the block into a single undo step."""
+        self.history.begin(label)
+        try:
+            with self._deferred_index_updates():
+                yield
+        finally:
+            self.history.end()
+
+    @contextmanager
+    def _deferred_index_updates(self) -> Iterator[None]:
+        """Collect macros changed inside the block and refresh the search index once at the end."""
+        if self._search_index is None or self._index_deferred is not None:
+            yield
+            return
+        self._index_deferred = set()
+        try:
+            yield
+        finally:
+            changed, self._index_deferred = self._index_deferred, None
+            self._refresh_index(changed)
+
+    def _refresh_index(self, changed: Set[MacroAddress]) -> None:
+        index = self._search_index
+        if index is None:
+            return
+        for book_idx, set_idx, side, macro_idx in changed:
+            macro = self.books[book_idx].sets[set_idx].get(side, macro_idx)
+            index.update((book_idx, set_idx, side, macro_idx), macro.name, macro.lines)
+
     # -------------------------- persistence --------------------------
-    def save(self) -> Path:
-        payload = {
+    def _payload(self) -> Dict[str, Any]:
+        return {
             "version": self.VERSION,
             "character_id": self.character_id,
             "updated_at": datetime.datetime.now().isoformat(),
             "books": [b.to_dict() for b in self.books],
         }
+
+    def save(self) -> Path:
+        path = self._write_json(self.json_path, self._payload())
+        self.dirty = False
+        self._disk_stamp = _file_stamp(path)
+        return path
+
+    def is_stale(self) -> bool:
+        """True when the JSON on disk was changed by someone else since it was loaded/saved."""
+        return _file_stamp(self.json_path) != self._disk_stamp
+
+    def save_checkpoint(self, tag: str) -> Path:
+        """Write the current state next to the main JSON as ``macros_<id>.<tag>.json``."""
+        path = self.json_path.with_name(f"macros_{self.character_id}.{tag}.json")
+        return self._write_json(path, self._payload())
+
+    @staticmethod
+    def _write_json(path: Path, payload: Dict[str, Any]) -> Path:
         text = json.dumps(payload, ensure_ascii=False, indent=2)
-        path = self.json_path
         tmp_fd, tmp_path = tempfile.mkstemp(prefix=path.name, dir=str(path.parent))
         try:
             with open(tmp_fd, "w", encoding="utf-8") as handle:
@@ -176,17 +838,22 @@ class MacroRepository:
         path = inst.json_path
         if path.exists():
             with path.open("r", encoding="utf-8") as handle:
-                raw = json.load(handle)
+                text = handle.read()
+            raw = json.loads(text)
             if int(raw.get("version", 0)) != cls.VERSION:
                 # Future schema migrations can be handled here.
                 pass
+            # 保存済みJSONは通常デコード済みの <<...>> 表記なので、
+            # センチネル文字が一度も現れなければ行ごとのデコードを丸ごと省略する
+            decode = _needs_decode(text)
             books_raw = raw.get("books", [])
             books: List[MacroBook] = []
             for entry in books_raw[:40]:
-                books.append(MacroBook.from_dict(entry))
+                books.append(MacroBook.from_dict(entry, decode))
             while len(books) < 40:
                 books.append(MacroBook())
             inst.books = books
+            inst._disk_stamp = _file_stamp(path)
         else:
             inst.save()
         return inst
@@ -208,10 +875,15 @@ class MacroRepository:
         save: bool = True,
     ) -> Macro:
         macro = self.get_macro(book_idx, set_idx, side, macro_idx)
+        before = macro.snapshot()
         if name is not None:
             macro.name = str(name)
         if lines is not None:
             macro.lines = _six_lines(lines)
+        after = macro.snapshot()
+        if after != before:
+            self.history.record(("macro", book_idx, set_idx, side, macro_idx), before, after, "edit")
+            self._macro_changed(book_idx, set_idx, side, macro_idx)
         if save:
             self.save()
         return macro
@@ -220,8 +892,14 @@ class MacroRepository:
         self, book_idx: int, set_idx: int, side: Side, macro_idx: int, save: bool = True
     ) -> Macro:
         macro = self.get_macro(book_idx, set_idx, side, macro_idx)
+        before = macro.snapshot()
         macro.name = ""
         macro.lines = ["", "", "", "", "", ""]
+        if before != _EMPTY_MACRO_SNAPSHOT:
+            self.history.record(
+                ("macro", book_idx, set_idx, side, macro_idx), before, _EMPTY_MACRO_SNAPSHOT, "clear"
+            )
+            self._macro_changed(book_idx, set_idx, side, macro_idx)
         if save:
             self.save()
         return macro
@@ -239,26 +917,70 @@ class MacroRepository:
     ) -> Optional[Macro]:
         if not self._clipboard:
             return None
-        pasted = self.set_macro(
-            book_idx,
-            set_idx,
-            side,
-            macro_idx,
-            name=self._clipboard.name,
-            lines=list(self._clipboard.lines),
-            save=save,
-        )
+        with self.batch("paste"):
+            pasted = self.set_macro(
+                book_idx,
+                set_idx,
+                side,
+                macro_idx,
+                name=self._clipboard.name,
+                lines=list(self._clipboard.lines),
+                save=save,
+            )
         return pasted
 
     def rename_set(self, book_idx: int, set_idx: int, new_name: str, save: bool = True) -> None:
         assert 0 <= book_idx < 40 and 0 <= set_idx < 10
-        self.books[book_idx].sets[set_idx].name = str(new_name)
+        macro_set = self.books[book_idx].sets[set_idx]
+        self.history.record(("set_name", book_idx, set_idx), macro_set.name, str(new_name), "rename")
+        macro_set.name = str(new_name)
+        self._name_changed(book_idx)
         if save:
             self.save()
 
     def rename_book(self, book_idx: int, new_name: str, save: bool = True) -> None:
         assert 0 <= book_idx < 40
+        self.history.record(("book_name", book_idx), self.books[book_idx].name, str(new_name), "rename")
         self.books[book_idx].name = str(new_name)
+        self._name_changed(book_idx)
+        if save:
+            self.save()
+
+    def snapshot_book(self, book_idx: int) -> MacroBookSnapshot:
+        assert 0 <= book_idx < 40
+        return self.books[book_idx].snapshot()
+
+    def snapshot_set(self, book_idx: int, set_idx: int) -> MacroSetSnapshot:
+        assert 0 <= book_idx < 40 and 0 <= set_idx < 10
+        return self.books[book_idx].sets[set_idx].snapshot()
+
+    def restore_book(self, book_idx: int, snap: MacroBookSnapshot, save: bool = True) -> None:
+        assert 0 <= book_idx < 40
+        with self.batch("paste_book"):
+            self._assign_book(book_idx, snap)
+        if save:
+            self.save()
+
+    def restore_set(
+        self, book_idx: int, set_idx: int, snap: MacroSetSnapshot, save: bool = True
+    ) -> None:
+        assert 0 <= book_idx < 40 and 0 <= set_idx < 10
+        with self.batch("paste_set"):
+            self._assign_set(book_idx, set_idx, snap)
+        if save:
+            self.save()
+
+    def clear_book(self, book_idx: int, name: str = "", save: bool = True) -> None:
+        assert 0 <= book_idx < 40
+        with self.batch("clear_book"):
+            self._assign_book(book_idx, MacroBook(name=str(name)).snapshot())
+        if save:
+            self.save()
+
+    def clear_set(self, book_idx: int, set_idx: int, save: bool = True) -> None:
+        assert 0 <= book_idx < 40 and 0 <= set_idx < 10
+        with self.batch("clear_set"):
+            self._assign_set(book_idx, set_idx, MacroSet().snapshot())
         if save:
             self.save()
 
@@ -282,7 +1004,10 @@ class MacroRepository:
                         old_set = old_book.sets[set_idx]
                         if not new_set.name and old_set.name:
                             new_set.name = old_set.name
-        self.books = new_books
+        # 既存オブジェクトへ差分だけを書き込み、取り込み全体を1つの取り消し単位にする
+        with self.batch("import"):
+            for idx, book in enumerate(new_books):
+                self._assign_book(idx, book.snapshot())
         if save:
             self.save()
 
@@ -304,20 +1029,387 @@ class MacroRepository:
             return 0
 
         changed_count = 0
-        for book in self.books:
-            for macro_set in book.sets:
-                for macro in macro_set.ctrl + macro_set.alt:
-                    for i, line in enumerate(macro.lines):
-                        if line:
-                            normalized = normalize_to_current_language(line)
-                            if normalized != line:
-                                macro.lines[i] = normalized
-                                changed_count += 1
+        with self.batch("normalize"):
+            for book_idx, book in enumerate(self.books):
+                for set_idx, macro_set in enumerate(book.sets):
+                    for side in ("ctrl", "alt"):
+                        for macro_idx, macro in enumerate(macro_set._target(side)):
+                            before = macro.snapshot()
+                            for i, line in enumerate(macro.lines):
+                                if line:
+                                    normalized = normalize_to_current_language(line)
+                                    if normalized != line:
+                                        macro.lines[i] = normalized
+                                        changed_count += 1
+                            after = macro.snapshot()
+                            if after != before:
+                                self.history.record(
+                                    ("macro", book_idx, set_idx, side, macro_idx), before, after
+                                )
+                                self._macro_changed(book_idx, set_idx, side, macro_idx)
         if save and changed_count > 0:
             self.save()
         return changed_count
 
 
+    # -------------------------- hashing / diff --------------------------
+    @property
+    def hash_tree(self) -> MacroHashTree:
+        """Live hash tree over ``self.books``, invalidated incrementally on edits."""
+        if self._hash_tree is None or self._hash_tree.books is not self.books:
+            self._hash_tree = MacroHashTree(self.books)
+        return self._hash_tree
+
+    def snapshot_books(self) -> Tuple[MacroBookSnapshot, ...]:
+        return tuple(book.snapshot() for book in self.books)
+
+    @property
+    def import_base_path(self) -> Path:
+        return self.json_path.with_name(f"macros_{self.character_id}.import_base.json")
+
+    def save_import_base(self, payload: Dict[str, Any]) -> Path:
+        """Remember the USER folder state of the last import/copy as the merge base."""
+        books = [
+            MacroBook.from_snapshot(book).to_dict() for book in books_snapshot_from_payload(payload)
+        ]
+        return self._write_json(
+            self.import_base_path,
+            {
+                "version": self.VERSION,
+                "character_id": self.character_id,
+                "updated_at": datetime.datetime.now().isoformat(),
+                "books": books,
+            },
+        )
+
+    def load_import_base(self) -> Optional[Tuple[MacroBookSnapshot, ...]]:
+        path = self.import_base_path
+        if not path.exists():
+            return None
+        try:
+            with path.open("r", encoding="utf-8") as handle:
+                raw = json.load(handle)
+        except (OSError, ValueError):
+            return None
+        return books_snapshot_from_payload(raw)
+
+    def apply_changes(self, changes: List[Tuple[HistoryPath, Any]], label: str, save: bool = True) -> int:
+        """Apply ``(path, value)`` pairs (as produced by diffs/merges) as one undo step."""
+        applied = 0
+        with self.batch(label):
+            for path, value in changes:
+                kind = path[0]
+                if kind == "macro":
+                    _, book_idx, set_idx, side, macro_idx = path
+                    before = self.get_macro(book_idx, set_idx, side, macro_idx).snapshot()
+                elif kind == "set_name":
+                    before = self.books[path[1]].sets[path[2]].name
+                else:
+                    before = self.books[path[1]].name
+                if before == value:
+                    continue
+                self._assign(path, value)
+                self.history.record(path, before, value)
+                applied += 1
+        if save and applied:
+            self.save()
+        return applied
+
+    def diff_against(self, other: Any, include_names: bool = True) -> List[HistoryPath]:
+        """Compare with another repository, hash tree, snapshot tuple or ``books`` payload."""
+        if isinstance(other, MacroRepository):
+            tree = other.hash_tree
+        elif isinstance(other, MacroHashTree):
+            tree = other
+        elif isinstance(other, tuple):
+            tree = MacroHashTree(other)
+        else:
+            tree = MacroHashTree.from_payload(other)
+        return self.hash_tree.diff(tree, include_names=include_names)
+
+    # -------------------------- search --------------------------
+    @staticmethod
+    def build_search_index(books: Tuple[MacroBookSnapshot, ...]) -> MacroSearchIndex:
+        """Build an index from immutable snapshots; safe to call off the GUI thread."""
+        index = MacroSearchIndex()
+        for book_idx, book in enumerate(books):
+            for set_idx, macro_set in enumerate(book.sets):
+                for side in ("ctrl", "alt"):
+                    for macro_idx, macro in enumerate(getattr(macro_set, side)):
+                        if macro.name or any(macro.lines):
+                            index.update((book_idx, set_idx, side, macro_idx), macro.name, list(macro.lines))
+        return index
+
+    @property
+    def has_search_index(self) -> bool:
+        return self._search_index is not None
+
+    @property
+    def search_index_building(self) -> bool:
+        return self._index_pending is not None
+
+    def begin_search_index_build(self) -> Tuple[MacroBookSnapshot, ...]:
+        """Return the snapshot to index in the background and start tracking edits made meanwhile."""
+        self._index_pending = set()
+        return self.snapshot_books()
+
+    def install_search_index(self, index: MacroSearchIndex) -> None:
+        """Adopt an index built by :meth:`build_search_index`, replaying edits made since the snapshot."""
+        pending, self._index_pending = self._index_pending, None
+        if self._search_index is not None or pending is None:
+            return
+        for book_idx, set_idx, side, macro_idx in pending:
+            macro = self.books[book_idx].sets[set_idx].get(side, macro_idx)
+            index.update((book_idx, set_idx, side, macro_idx), macro.name, macro.lines)
+        self._search_index = index
+
+    @property
+    def search_index(self) -> MacroSearchIndex:
+        """Inverted index over all macros, kept up to date; built here if no background build installed one."""
+        if self._search_index is None:
+            self._index_pending = None
+            self._search_index = self.build_search_index(self.snapshot_books())
+        return self._search_index
+
+    def search(self, query: str, limit: int = 200) -> List[SearchHit]:
+        terms = [t for t in query.lower().split() if t]
+        hits: List[SearchHit] = []
+        for book_idx, set_idx, side, macro_idx in self.search_index.query(query, limit):
+            macro = self.books[book_idx].sets[set_idx].get(side, macro_idx)
+            line_idx, text = -1, macro.name
+            # 表示用に、最初に語を含む行を選ぶ（定型文の別言語表記のみで一致した場合は名前）
+            for i, line in enumerate(macro.lines):
+                lowered = line.lower()
+                if any(t in lowered for t in terms):
+                    line_idx, text = i, line
+                    break
+            hits.append(SearchHit(book_idx, set_idx, side, macro_idx, macro.name, line_idx, text))
+        return hits
+
+    # -------------------------- find / replace --------------------------
+    def find_replacements(
+        self,
+        pattern: str,
+        replacement: str,
+        mode: ReplaceMode = "plain",
+        case_sensitive: bool = False,
+        include_names: bool = False,
+    ) -> List[ReplaceEdit]:
+        """Compute every edit a repository-wide replace would make, without applying it.
+
+        Modes:
+            plain: literal substring.
+            regex: Python regular expression; ``replacement`` may use group references.
+            autotrans: ``<<token>>`` whose ja/en spelling matches ``pattern`` is
+                replaced by ``<<replacement>>`` regardless of the language it was stored in.
+
+        Raises:
+            re.error: ``mode == "regex"`` で不正なパターンが渡された場合
+        """
+        if not pattern:
+            return []
+        flags = 0 if case_sensitive else re.IGNORECASE
+        addresses: Optional[List[MacroAddress]] = None
+        if mode == "regex":
+            regex = re.compile(pattern, flags)
+
+            def substitute(text: str) -> str:
+                return regex.sub(replacement, text)
+        elif mode == "autotrans":
+            body = pattern.strip()
+            if body.startswith("<<") and body.endswith(">>"):
+                body = body[2:-2]
+            new_body = replacement.strip()
+            if new_body.startswith("<<") and new_body.endswith(">>"):
+                new_body = new_body[2:-2]
+            spellings = set(autotrans_variants(body)) | {body.strip()}
+            if not case_sensitive:
+                spellings = {v.lower() for v in spellings}
+
+            def substitute(text: str) -> str:
+                def _swap(match: "re.Match[str]") -> str:
+                    inner = match.group(1).strip()
+                    key = inner if case_sensitive else inner.lower()
+                    return f"<<{new_body}>>" if key in spellings else match.group(0)
+
+                return _AUTOTRANS_BODY.sub(_swap, text) if "<<" in text else text
+
+            found: Set[MacroAddress] = set()
+            for spelling in spellings:
+                found.update(self.search_index.query(spelling))
+            addresses = sorted(found)
+        else:
+            literal = re.compile(re.escape(pattern), flags)
+
+            def substitute(text: str) -> str:
+                return literal.sub(lambda _: replacement, text)
+
+            # 検索インデックスで候補マクロを絞り込む（インデックスは小文字化済みなので常に上位集合）
+            # 空白だけのパターンは語に分けると何も残らないため、全マクロを走査する
+            if pattern.split():
+                addresses = self.search_index.query(pattern)
+
+        if addresses is None:
+            addresses = [
+                (b, s, side, i)
+                for b in range(40)
+                for s in range(10)
+                for side in ("ctrl", "alt")
+                for i in range(10)
+            ]
+        edits: List[ReplaceEdit] = []
+        for book_idx, set_idx, side, macro_idx in addresses:
+            macro = self.books[book_idx].sets[set_idx].get(side, macro_idx)
+            if include_names and macro.name:
+                new_name = substitute(macro.name)
+                if new_name != macro.name:
+                    edits.append(ReplaceEdit(book_idx, set_idx, side, macro_idx, -1, macro.name, new_name))
+            for line_idx, line in enumerate(macro.lines):
+                if not line:
+                    continue
+                new_line = substitute(line)
+                if new_line != line:
+                    edits.append(ReplaceEdit(book_idx, set_idx, side, macro_idx, line_idx, line, new_line))
+        return edits
+
+    def apply_replacements(self, edits: List[ReplaceEdit], save: bool = True) -> int:
+        """Apply previewed edits as one undo step and a single save.
+
+        Edits whose ``before`` no longer matches the macro (edited after preview) are skipped.
+        Returns the number of edits applied.
+        """
+        grouped: Dict[MacroAddress, List[ReplaceEdit]] = {}
+        for edit in edits:
+            grouped.setdefault((edit.book_idx, edit.set_idx, edit.side, edit.macro_idx), []).append(edit)
+        applied = 0
+        with self.batch("replace"):
+            for (book_idx, set_idx, side, macro_idx), macro_edits in grouped.items():
+                macro = self.get_macro(book_idx, set_idx, side, macro_idx)
+                name = macro.name
+                lines = list(macro.lines)
+                for edit in macro_edits:
+                    if edit.line_idx < 0:
+                        if name == edit.before:
+                            name = edit.after
+                            applied += 1
+                    elif 0 <= edit.line_idx < len(lines) and lines[edit.line_idx] == edit.before:
+                        lines[edit.line_idx] = edit.after
+                        applied += 1
+                self.set_macro(book_idx, set_idx, side, macro_idx, name=name, lines=lines, save=False)
+        if save and applied:
+            self.save()
+        return applied
+
+    # -------------------------- undo / redo --------------------------
+    def can_undo(self) -> bool:
+        return self.history.can_undo()
+
+    def can_redo(self) -> bool:
+        return self.history.can_redo()
+
+    def undo(self, save: bool = True) -> Optional[HistoryEntry]:
+        entry = self.history.pop_undo()
+        if entry is None:
+            return None
+        with self._deferred_index_updates():
+            for change in reversed(entry.changes):
+                self._assign(change.path, change.before)
+        if save:
+            self.save()
+        return entry
+
+    def redo(self, save: bool = True) -> Optional[HistoryEntry]:
+        entry = self.history.pop_redo()
+        if entry is None:
+            return None
+        with self._deferred_index_updates():
+            for change in entry.changes:
+                self._assign(change.path, change.after)
+        if save:
+            self.save()
+        return entry
+
+
+class RepositoryCache:
+    """Keep the most recently used character repositories loaded for the session.
+
+    Entries are keyed by ``(character_id, base_dir)``. A cached repository is
+    reloaded when its JSON changed on disk, and evicted repositories are saved
+    first if they still hold unsaved changes.
+
+    A stale entry that also holds unsaved changes is a conflict: ``resolve_stale``
+    decides (True = reload from disk, False = keep the in-memory state). Without
+    a resolver the in-memory state is written to a ``stale`` checkpoint before
+    the reload, so nothing is lost silently.
+    """
+
+    def __init__(self, capacity: int = 5) -> None:
+        self.capacity = max(1, int(capacity))
+        self._entries: "OrderedDict[Tuple[str, str], MacroRepository]" = OrderedDict()
+
+    @staticmethod
+    def _key(character_id: str, base_dir: Optional[Path]) -> Tuple[str, str]:
+        base = Path(base_dir) if base_dir else Path.cwd() / "macros"
+        return (str(character_id), str(base.resolve()))
+
+    def get(
+        self,
+        character_id: str,
+        base_dir: Optional[Path] = None,
+        resolve_stale: Optional[Callable[[MacroRepository], bool]] = None,
+    ) -> MacroRepository:
+        key = self._key(character_id, base_dir)
+        repo = self._entries.get(key)
+        if repo is not None and repo.is_stale():
+            # 外部でJSONが書き換えられた場合はディスクの内容を優先して読み直す
+            if not repo.dirty:
+                repo = None
+            elif resolve_stale is None:
+                repo.save_checkpoint("stale")
+                repo = None
+            elif resolve_stale(repo):
+                repo = None
+            else:
+                # メモリ側を残す。次の保存でディスクの内容を上書きする
+                repo._disk_stamp = _file_stamp(repo.json_path)
+        if repo is None:
+            repo = MacroRepository.load_or_create(character_id=character_id, base_dir=base_dir)
+        self._entries[key] = repo
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            _, evicted = self._entries.popitem(last=False)
+            if evicted.dirty:
+                evicted.save()
+        return repo
+
+    def discard(self, repo: Optional[MacroRepository]) -> None:
+        """Forget ``repo`` (e.g. after its unsaved changes were thrown away)."""
+        if repo is None:
+            return
+        for key, cached in list(self._entries.items()):
+            if cached is repo:
+                del self._entries[key]
+
+    def reload(self, repo: MacroRepository) -> MacroRepository:
+        """Replace ``repo`` with a fresh copy read from its JSON, dropping its unsaved changes."""
+        fresh = MacroRepository.load_or_create(character_id=repo.character_id, base_dir=repo.base_dir)
+        key = self._key(repo.character_id, repo.base_dir)
+        self._entries[key] = fresh
+        self._entries.move_to_end(key)
+        return fresh
+
+    def flush(self) -> None:
+        for repo in self._entries.values():
+            if repo.dirty:
+                repo.save()
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+repository_cache = RepositoryCache()
+
+
 class MacroController:
     """Thin helper that UI code can use without depending on PyQt."""
 
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+RESOURCES_DB = Path(__file__).resolve().parent / "autotrans_data" / "resources.db"
+CACHE_PATH = Path("./data") / "cache" / "resources.json"
+# スナップショットの形式を変えたら上げる
+CACHE_VERSION = 1
+
+
+@dataclass
+class EditorResources:
+    """Command list and resource names as stored in resources.db.
+
+    ``names`` maps ``type -> locale -> names``; the editor decides how to
+    split and order them.
+    """
+
+    commands: List[str] = field(default_factory=list)
+    names: Dict[str, Dict[str, List[str]]] = field(default_factory=dict)
+
+    def names_of(self, resource_type: str) -> List[str]:
+        """All names of a type, every locale merged."""
+        merged: List[str] = []
+        for values in self.names.get(resource_type, {}).values():
+            merged.extend(values)
+        return merged
+
+
+def _db_stamp(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _read_db(path: Path) -> EditorResources:
+    """Read everything over one connection: the commands and one grouped name query."""
+    resources = EditorResources()
+    conn = sqlite3.connect(f"file:{path.as_posix()}?mode=ro", uri=True)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT command FROM commands ORDER BY command")
+        resources.commands = [row[0] for row in cursor.fetchall() if row[0]]
+        cursor.execute(
+            "SELECT type, locale, name FROM resource_names ORDER BY type, locale, name"
+        )
+        for resource_type, locale, name in cursor.fetchall():
+            if not name:
+                continue
+            resources.names.setdefault(resource_type, {}).setdefault(locale or "", []).append(name)
+    finally:
+        conn.close()
+    return resources
+
+
+def _load_snapshot(cache_path: Path, stamp: Tuple[int, int]) -> Optional[EditorResources]:
+    try:
+        with cache_path.open("r", encoding="utf-8") as fp:
+            payload = json.load(fp)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(payload, dict):
+        return None
+    if payload.get("version") != CACHE_VERSION or payload.get("stamp") != list(stamp):
+        return None
+    commands = payload.get("commands")
+    names = payload.get("names")
+    if not isinstance(commands, list) or not isinstance(names, dict):
+        return None
+    return EditorResources(commands=commands, names=names)
+
+
+def _save_snapshot(cache_path: Path, stamp: Tuple[int, int], resources: EditorResources) -> None:
+    payload = {
+        "version": CACHE_VERSION,
+        "stamp": list(stamp),
+        "commands": resources.commands,
+        "names": resources.names,
+    }
+    tmp_path = cache_path.with_name(cache_path.name + ".tmp")
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with tmp_path.open("w", encoding="utf-8") as fp:
+            json.dump(payload, fp, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, cache_path)
+    except OSError as exc:
+        # キャッシュは作れなくても動作には影響しない
+        logger.debug("resource snapshot not written: %s", exc)
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
+
+
+def load_resources(db_path: Path = RESOURCES_DB, cache_path: Path = CACHE_PATH) -> EditorResources:
+    """Load the editor resources, preferring a snapshot that matches the DB's mtime and size."""
+    stamp = _db_stamp(db_path)
+    if stamp is None:
+        return EditorResources()
+    cached = _load_snapshot(cache_path, stamp)
+    if cached is not None:
+        return cached
+    try:
+        resources = _read_db(db_path)
+    except sqlite3.Error as exc:
+        logger.warning("resources.db could not be read: %s", exc)
+        return EditorResources()
+    _save_snapshot(cache_path, stamp, resources)
+    return resources
+
+
+class ResourceRegistry:
+    """Loads the resources once, either on demand or on a background thread.
+
+    ``prepare`` turns the raw resources into whatever the caller needs (lists,
+    automata, patterns) and also runs on the loader thread. Listeners added
+    with ``add_listener`` are called from that thread once the result is ready.
+    """
+
+    def __init__(self, prepare: Callable[[EditorResources], object] = lambda res: res) -> None:
+        self._prepare = prepare
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._result: object = None
+        self._listeners: List[Callable[[object], None]] = []
+
+    def is_loaded(self) -> bool:
+        return self._done.is_set()
+
+    def add_listener(self, callback: Callable[[object], None]) -> None:
+        with self._lock:
+            if not self._done.is_set():
+                self._listeners.append(callback)
+                return
+        callback(self._result)
+
+    def start(self) -> None:
+        """Start loading on a daemon thread (no-op if already started)."""
+        with self._lock:
+            if self._thread is not None or self._done.is_set():
+                return
+            self._thread = threading.Thread(target=self._run, name="resource-registry", daemon=True)
+            self._thread.start()
+
+    def get(self) -> object:
+        """Return the prepared result, loading synchronously if needed."""
+        with self._lock:
+            # 誰も読み込みを始めていなければ、このスレッドで読む
+            run_here = self._thread is None and not self._done.is_set()
+            if run_here:
+                self._thread = threading.current_thread()
+        if run_here:
+            self._run()
+        self._done.wait()
+        return self._result
+
+    def _run(self) -> None:
+        try:
+            result = self._prepare(load_resources())
+        except Exception:
+            logger.exception("failed to load editor resources")
+            result = self._prepare(EditorResources())
+        with self._lock:
+            self._result = result
+            self._done.set()
+            listeners, self._listeners = self._listeners, []
+        for callback in listeners:
+            try:
+                callback(result)
+            except Exception:
+                logger.exception("resource listener failed")
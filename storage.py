@@ -1,11 +1,19 @@
 from __future__ import annotations
 
+import hashlib
+import json
 import os
 import shutil
+import stat
+import threading
+import zlib
 from pathlib import Path
 from datetime import datetime
 import configparser
-from typing import List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 CONFIG_FILE = Path("names.ini")
 SECTION = "DisplayNames"
@@ -13,20 +21,95 @@ SETTINGS_SECTION = "Settings"
 
 DATA_ROOT = Path("./data")
 BACKUP_ROOT = DATA_ROOT / "backup"
+BACKUP_OBJECTS = BACKUP_ROOT / "objects"
+BACKUP_GENERATIONS = BACKUP_ROOT / "generations"
 EDIT_ROOT = DATA_ROOT / "edit"
 EXPORT_ROOT = DATA_ROOT / "export"
 FFXI_DOC_ROOT = Path(os.path.expanduser("~")) / "Documents" / "My Games" / "FINAL FANTASY XI" / "USER"
 FFXI_USR_ROOT = Path(r"C:\Program Files (x86)\PlayOnline\SquareEnix\FINAL FANTASY XI\USER")
-MAX_HISTORY = 5
+MAX_HISTORY = 30
+
+# data/edit の準備が終わるまで取り込み・テンプレート解決を待たせるためのゲート
+_edit_ready = threading.Event()
+_edit_ready.set()
+
+
+def mark_edit_pending() -> None:
+    _edit_ready.clear()
+
+
+def mark_edit_ready() -> None:
+    _edit_ready.set()
+
+
+def is_edit_ready() -> bool:
+    return _edit_ready.is_set()
+
+
+def wait_for_edit_ready(timeout: Optional[float] = None) -> bool:
+    """Block until the startup backup has finished preparing data/edit."""
+    return _edit_ready.wait(timeout)
+
+
+# names.ini は mtime をキーにプロセス内でキャッシュし、書き込みは settings_batch() でまとめる
+_cfg_cache: Optional[configparser.ConfigParser] = None
+_cfg_stamp: Optional[Tuple[int, int]] = None
+_cfg_dirty = False
+_cfg_batch_depth = 0
+
+
+def _config_stamp() -> Optional[Tuple[int, int]]:
+    try:
+        st = CONFIG_FILE.stat()
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
 
 
 def _load_cfg() -> configparser.ConfigParser:
-    cfg = configparser.ConfigParser()
-    if CONFIG_FILE.exists():
-        cfg.read(CONFIG_FILE, encoding="utf-8")
-    if SECTION not in cfg:
-        cfg[SECTION] = {}
-    return cfg
+    global _cfg_cache, _cfg_stamp
+    stamp = _config_stamp()
+    # 未書き込みの変更がある間は外部の更新より手元の内容を優先する
+    if _cfg_cache is None or (stamp != _cfg_stamp and not _cfg_dirty):
+        cfg = configparser.ConfigParser()
+        if stamp is not None:
+            cfg.read(CONFIG_FILE, encoding="utf-8")
+        if SECTION not in cfg:
+            cfg[SECTION] = {}
+        _cfg_cache = cfg
+        _cfg_stamp = stamp
+    return _cfg_cache
+
+
+def _save_cfg() -> None:
+    global _cfg_dirty
+    _cfg_dirty = True
+    if _cfg_batch_depth == 0:
+        flush_settings()
+
+
+def flush_settings() -> None:
+    """Write pending names.ini changes to disk."""
+    global _cfg_dirty, _cfg_stamp
+    if not _cfg_dirty or _cfg_cache is None:
+        return
+    with CONFIG_FILE.open("w", encoding="utf-8") as handle:
+        _cfg_cache.write(handle)
+    _cfg_dirty = False
+    _cfg_stamp = _config_stamp()
+
+
+@contextmanager
+def settings_batch() -> Iterator[None]:
+    """Group several setting updates into a single names.ini write."""
+    global _cfg_batch_depth
+    _cfg_batch_depth += 1
+    try:
+        yield
+    finally:
+        _cfg_batch_depth -= 1
+        if _cfg_batch_depth == 0:
+            flush_settings()
 
 
 def get_display_name(folder_id: str) -> str:
@@ -34,19 +117,31 @@ def get_display_name(folder_id: str) -> str:
     return cfg[SECTION].get(folder_id, folder_id)
 
 
+def get_display_names(folder_ids: Optional[Iterable[str]] = None) -> Dict[str, str]:
+    """Display names from one cached parse of names.ini, keyed by folder id.
+
+    With ``folder_ids`` every id is present (falling back to the id itself);
+    without, all configured names are returned.
+    """
+    names = _load_cfg()[SECTION]
+    if folder_ids is None:
+        return dict(names)
+    return {folder_id: names.get(folder_id, folder_id) for folder_id in folder_ids}
+
+
 def set_display_name(folder_id: str, display: str) -> None:
     cfg = _load_cfg()
+    if cfg[SECTION].get(folder_id) == display:
+        return
     cfg[SECTION][folder_id] = display
-    with CONFIG_FILE.open("w", encoding="utf-8") as handle:
-        cfg.write(handle)
+    _save_cfg()
 
 
 def delete_display_name(folder_id: str) -> None:
     cfg = _load_cfg()
     if folder_id in cfg[SECTION]:
         del cfg[SECTION][folder_id]
-        with CONFIG_FILE.open("w", encoding="utf-8") as handle:
-            cfg.write(handle)
+        _save_cfg()
 
 
 def get_theme() -> str:
@@ -62,9 +157,10 @@ def set_theme(theme_name: str) -> None:
     cfg = _load_cfg()
     if SETTINGS_SECTION not in cfg:
         cfg[SETTINGS_SECTION] = {}
+    if cfg[SETTINGS_SECTION].get("Theme") == theme_name:
+        return
     cfg[SETTINGS_SECTION]["Theme"] = theme_name
-    with CONFIG_FILE.open("w", encoding="utf-8") as handle:
-        cfg.write(handle)
+    _save_cfg()
 
 
 
@@ -133,66 +229,313 @@ def create_export_destination(
 
 def list_characters(mode: str) -> List[Tuple[str, str]]:
     ids = enum_character_ids(mode)
-    out: List[Tuple[str, str]] = []
-    for cid in ids:
-        out.append((cid, get_display_name(cid)))
+    names = get_display_names(ids)
+    out: List[Tuple[str, str]] = [(cid, names[cid]) for cid in ids]
     if not out and mode != "ffxi":
         out = [("sample1", "SampleChar")]
     return out
 
 
-def backup_and_prepare_edit() -> List[str]:
-    """Copy Program Files USER to data/backup + data/edit, keeping limited history."""
-    BACKUP_ROOT.mkdir(parents=True, exist_ok=True)
-    edit_root = ensure_local_root()
+def _file_digest(path: Path) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
 
-    if not FFXI_USR_ROOT.exists():
-        return []
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    generation = BACKUP_ROOT / timestamp
-    generation.mkdir(parents=True, exist_ok=True)
+def _unchanged(src: Path, other: Path) -> bool:
+    """Treat files as identical when size and mtime match, falling back to a content hash."""
+    try:
+        a = src.stat()
+        b = other.stat()
+    except OSError:
+        return False
+    if a.st_size != b.st_size:
+        return False
+    if a.st_mtime_ns == b.st_mtime_ns:
+        return True
+    # サイズ同一で mtime だけ違う場合（タイムスタンプ精度の差など）は中身で判定
+    return _file_digest(src) == _file_digest(other)
+
 
-    backed: List[str] = []
+def _make_writable(path: Path) -> None:
+    try:
+        os.chmod(path, stat.S_IWRITE | stat.S_IREAD)
+    except OSError:
+        pass
+
+
+def _iter_files(root: Path) -> Iterator[Tuple[Path, Path]]:
+    """Yield ``(absolute, relative)`` for every file below ``root``."""
+    for dirpath, _dirnames, filenames in os.walk(root):
+        base = Path(dirpath)
+        for name in filenames:
+            path = base / name
+            yield path, path.relative_to(root)
+
+
+def _backup_sources() -> Iterator[Tuple[Path, Path]]:
     for child in FFXI_USR_ROOT.iterdir():
         if child.is_dir():
-            shutil.copytree(child, generation / child.name, dirs_exist_ok=True)
-            backed.append(child.name)
-
+            for path, rel in _iter_files(child):
+                yield path, child.name / rel
     tig_file = FFXI_USR_ROOT / "tig.dat"
     if tig_file.exists():
-        shutil.copy2(tig_file, generation / tig_file.name)
-
-    histories = sorted([p for p in BACKUP_ROOT.iterdir() if p.is_dir()])
-    if len(histories) > MAX_HISTORY:
-        for old in histories[:-MAX_HISTORY]:
-            shutil.rmtree(old, ignore_errors=True)
-    histories = sorted([p for p in BACKUP_ROOT.iterdir() if p.is_dir()])
-    if not histories:
-        return backed
-
-    # Helper to remove read-only files
-    import stat
-    def remove_readonly(func, path, _):
-        os.chmod(path, stat.S_IWRITE)
-        func(path)
-
-    for child in edit_root.iterdir():
-        if child.is_dir():
-            shutil.rmtree(child, onerror=remove_readonly)
+        yield tig_file, Path(tig_file.name)
+
+
+def _sync_files(sources: List[Tuple[Path, Path]], dst_root: Path) -> int:
+    """Mirror ``(src, rel)`` pairs into ``dst_root`` copying only files that differ. Returns the copy count."""
+    copied = 0
+    wanted = set()
+    for src, rel in sources:
+        wanted.add(rel)
+        dest = dst_root / rel
+        if dest.exists():
+            if _unchanged(src, dest):
+                continue
+            _make_writable(dest)
         else:
-            try:
-                child.unlink()
-            except PermissionError:
-                os.chmod(child, stat.S_IWRITE)
-                child.unlink()
-
-    latest = histories[-1]
-    for item in latest.iterdir():
-        dest = edit_root / item.name
-        if item.is_dir():
-            shutil.copytree(item, dest, dirs_exist_ok=True)
+            dest.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(src, dest)
+        copied += 1
+
+    # コピー元に無くなったファイルと空ディレクトリを片付ける
+    for path, rel in list(_iter_files(dst_root)):
+        if rel not in wanted:
+            _make_writable(path)
+            path.unlink()
+    for dirpath, _dirnames, _filenames in sorted(os.walk(dst_root), key=lambda e: len(e[0]), reverse=True):
+        folder = Path(dirpath)
+        if folder != dst_root and not any(folder.iterdir()):
+            folder.rmdir()
+    return copied
+
+
+# ---- FFXI USER フォルダへの同期 ----
+@dataclass
+class SyncReport:
+    copied: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+    failed: List[Tuple[str, str]] = field(default_factory=list)
+    bytes_written: int = 0
+    permission_denied: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed
+
+
+def _is_macro_file(name: str) -> bool:
+    lower = name.lower()
+    return (lower.startswith("mcr") and lower.endswith(".dat")) or lower in {"mcr.ttl", "mcr_2.ttl"}
+
+
+def _sync_one(src: Path, dest: Path) -> Tuple[bool, int]:
+    """Copy ``src`` over ``dest`` unless identical. Returns (copied, bytes written)."""
+    data = src.read_bytes()
+    digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+    try:
+        if dest.stat().st_size == len(data) and _file_digest(dest) == digest:
+            return False, 0
+    except OSError:
+        pass
+    # 一時ファイルに書いて検証してから置き換え、途中で失敗しても半端なファイルを残さない
+    tmp = dest.with_name(f".{dest.name}.vanamacro.tmp")
+    try:
+        tmp.write_bytes(data)
+        shutil.copystat(src, tmp)
+        if _file_digest(tmp) != digest:
+            raise OSError(f"verification failed: {dest.name}")
+        if dest.exists():
+            # 読み取り専用属性が付いていると置き換えできない
+            _make_writable(dest)
+        os.replace(tmp, dest)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return True, len(data)
+
+
+def sync_macro_files(source: Path, destination: Path, max_workers: int = 4) -> SyncReport:
+    """Copy mcr*.dat / mcr*.ttl from ``source`` to ``destination`` where the content differs."""
+    destination.mkdir(parents=True, exist_ok=True)
+    names = sorted(p.name for p in source.iterdir() if p.is_file() and _is_macro_file(p.name))
+    report = SyncReport()
+
+    def work(name: str) -> Tuple[str, Optional[Tuple[bool, int]], Optional[OSError]]:
+        try:
+            return name, _sync_one(source / name, destination / name), None
+        except OSError as exc:
+            return name, None, exc
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        for name, result, error in pool.map(work, names):
+            if result is None:
+                report.failed.append((name, str(error)))
+                if isinstance(error, PermissionError):
+                    report.permission_denied = True
+            elif result[0]:
+                report.copied.append(name)
+                report.bytes_written += result[1]
+            else:
+                report.unchanged.append(name)
+    return report
+
+
+# ---- バックアップストア ----
+# data/backup/objects/<先頭2桁>/<hash> : zlib 圧縮したファイル内容（内容ハッシュで重複排除）
+# data/backup/generations/<timestamp>.json : 世代ごとの相対パス -> hash/size/mtime の一覧
+def _object_path(digest: str) -> Path:
+    return BACKUP_OBJECTS / digest[:2] / digest
+
+
+def _store_object(src: Path) -> str:
+    data = src.read_bytes()
+    digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+    target = _object_path(digest)
+    if not target.exists():
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(target.name + ".tmp")
+        tmp.write_bytes(zlib.compress(data, 6))
+        os.replace(tmp, target)
+    return digest
+
+
+def _write_manifest(name: str, files: Dict[str, Dict[str, Any]]) -> Path:
+    BACKUP_GENERATIONS.mkdir(parents=True, exist_ok=True)
+    path = BACKUP_GENERATIONS / f"{name}.json"
+    tmp = path.with_name(path.name + ".tmp")
+    payload = {"created_at": datetime.now().isoformat(), "files": files}
+    tmp.write_text(json.dumps(payload, ensure_ascii=False, indent=1, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, path)
+    return path
+
+
+def _read_manifest(name: str) -> Dict[str, Dict[str, Any]]:
+    path = BACKUP_GENERATIONS / f"{name}.json"
+    try:
+        return json.loads(path.read_text(encoding="utf-8")).get("files", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def list_generations() -> List[str]:
+    """Backup generation names, oldest first."""
+    if not BACKUP_GENERATIONS.exists():
+        return []
+    return sorted(p.stem for p in BACKUP_GENERATIONS.glob("*.json"))
+
+
+def restore_generation(name: str, destination: Path) -> int:
+    """Materialize backup generation ``name`` under ``destination``. Returns the file count."""
+    files = _read_manifest(name)
+    if not files:
+        raise FileNotFoundError(f"backup generation not found: {name}")
+    for rel, entry in files.items():
+        dest = Path(destination) / rel
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        if dest.exists():
+            _make_writable(dest)
+        dest.write_bytes(zlib.decompress(_object_path(entry["hash"]).read_bytes()))
+        os.utime(dest, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+    return len(files)
+
+
+def _new_generation_name() -> str:
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    name = timestamp
+    suffix = 1
+    while (BACKUP_GENERATIONS / f"{name}.json").exists():
+        name = f"{timestamp}_{suffix:02d}"
+        suffix += 1
+    return name
+
+
+def _snapshot_files(
+    sources: List[Tuple[Path, Path]],
+    previous: Dict[str, Dict[str, Any]],
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    files: Dict[str, Dict[str, Any]] = {}
+    total = len(sources)
+    for done, (src, rel) in enumerate(sources, start=1):
+        if progress is not None:
+            progress(done, total)
+        key = rel.as_posix()
+        st = src.stat()
+        prev = previous.get(key)
+        if prev and prev["size"] == st.st_size and prev["mtime_ns"] == st.st_mtime_ns:
+            # size/mtime が前世代と同じならハッシュ計算も読み込みも省略
+            digest = prev["hash"]
         else:
-            shutil.copy2(item, dest)
+            digest = _store_object(src)
+        files[key] = {"hash": digest, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    return files
+
+
+def _migrate_legacy_generations() -> None:
+    """Pack old ``data/backup/<timestamp>/`` copies into the store and remove them."""
+    legacy = sorted(
+        p for p in BACKUP_ROOT.iterdir()
+        if p.is_dir() and p not in (BACKUP_OBJECTS, BACKUP_GENERATIONS)
+    )
+    for folder in legacy:
+        if not (BACKUP_GENERATIONS / f"{folder.name}.json").exists():
+            files = _snapshot_files(list(_iter_files(folder)), {})
+            _write_manifest(folder.name, files)
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def _prune_generations() -> None:
+    """Keep the newest MAX_HISTORY generations and drop objects nobody references."""
+    generations = list_generations()
+    expired = generations[:-MAX_HISTORY] if len(generations) > MAX_HISTORY else []
+    if not expired:
+        return
+    for name in expired:
+        (BACKUP_GENERATIONS / f"{name}.json").unlink(missing_ok=True)
+    referenced = set()
+    for name in list_generations():
+        referenced.update(entry["hash"] for entry in _read_manifest(name).values())
+    for path in BACKUP_OBJECTS.glob("*/*"):
+        if path.name not in referenced:
+            path.unlink(missing_ok=True)
+
+
+def backup_and_prepare_edit(progress: Optional[Callable[[int, int], None]] = None) -> List[str]:
+    """Back up Program Files USER into the backup store and mirror it into data/edit.
+
+    Each generation is a manifest of content hashes; file contents are stored
+    once, zlib-compressed, so unchanged and duplicate set files cost nothing.
+    A generation identical to the previous one is not recorded again.
+    ``progress(done, total)`` is called per file; data/edit is marked ready
+    when this returns.
+    """
+    mark_edit_pending()
+    try:
+        return _backup_and_prepare_edit(progress)
+    finally:
+        mark_edit_ready()
+
+
+def _backup_and_prepare_edit(progress: Optional[Callable[[int, int], None]]) -> List[str]:
+    BACKUP_ROOT.mkdir(parents=True, exist_ok=True)
+    edit_root = ensure_local_root()
+
+    if not FFXI_USR_ROOT.exists():
+        return []
+
+    _migrate_legacy_generations()
+    generations = list_generations()
+    previous = _read_manifest(generations[-1]) if generations else {}
+
+    backed: List[str] = sorted(child.name for child in FFXI_USR_ROOT.iterdir() if child.is_dir())
+    sources = list(_backup_sources())
+    files = _snapshot_files(sources, previous, progress)
+    if files != previous:
+        _write_manifest(_new_generation_name(), files)
+        _prune_generations()
 
+    _sync_files(sources, edit_root)
     return backed
@@ -1,16 +1,21 @@
 ﻿from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QGroupBox,
     QPushButton, QListWidget, QListWidgetItem, QDialog, QLineEdit, QTextEdit, QLabel,
-    QSplitter, QComboBox, QInputDialog, QMessageBox, QCheckBox, QApplication, QSizePolicy
+    QSplitter, QComboBox, QInputDialog, QMessageBox, QCheckBox, QApplication, QSizePolicy,
+    QListView
+)
+from PyQt6.QtCore import (
+    Qt, QEvent, QSettings, QThread, QTimer, QAbstractListModel, QModelIndex, pyqtSignal
 )
-from PyQt6.QtCore import Qt, QEvent, QSettings
 from PyQt6.QtGui import QAction, QActionGroup, QFontMetrics, QKeySequence, QTextCursor
-import copy
 import json
 import os
+import re
 import subprocess
 import sys
-import shutil
+import threading
+import weakref
+from collections import OrderedDict
 from datetime import datetime
 from pathlib import Path
 from typing import Optional
@@ -35,26 +40,47 @@ except Exception:
     THEMES = {"Base": ""}
 
 try:
-    from ffxi_autotrans import load_autotrans_tree, reload_dictionaries
+    from ffxi_autotrans import (
+        load_autotrans_tree, reload_dictionaries, query_items, load_readings, match_auto_translates,
+    )
 except Exception:
     load_autotrans_tree = None
     reload_dictionaries = None
+    query_items = None
+    load_readings = None
+    match_auto_translates = None
 
 try:
     import exporter
 except Exception:
     exporter = None
 
+try:
+    import macro_merge
+except Exception:
+    macro_merge = None
+
+from ffxi_reading import text_to_hiragana as _text_to_hiragana
+
 # ---- モデル層（既存プロジェクトの model.py を想定） ----
-from model import MacroRepository, MacroController, MacroBook, MacroSet
+from model import MacroHashTree, MacroRepository, MacroController, repository_cache
 
 try:
-    from ui_editor import MacroEditor
+    from ui_editor import MacroEditor, set_completion_usage, completion_usage_changed
+    from macro_completion import UsageTracker
 except ImportError:
     # ui_editor がない場合のフォールバック（通常のQTextEdit）
     class MacroEditor(QTextEdit):
         pass
 
+    UsageTracker = None
+
+    def set_completion_usage(usage):
+        pass
+
+    def completion_usage_changed():
+        pass
+
 
 
 # ========= キャラ管理ダイアログ =========
@@ -148,93 +174,172 @@ class CharacterManageDialog(QDialog):
 
 
 # ========= 定型文ダイアログ =========
-def _katakana_to_hiragana(text: str) -> str:
-    """カタカナをひらがなに変換"""
-    result = []
-    for char in text:
-        code = ord(char)
-        # カタカナ範囲: 0x30A1-0x30F6 → ひらがな: 0x3041-0x3096
-        if 0x30A1 <= code <= 0x30F6:
-            result.append(chr(code - 0x60))
-        else:
-            result.append(char)
-    return ''.join(result)
-
-
-# FFXI固有の読み方カスタム辞書
-# {漢字表記: ひらがな読み}
-_FFXI_READING_DICT = {
-    # 侍WS
-    "八之太刀": "はちのたち",
-    "燕飛": "えんぴ",
-    "月光": "げっこう",
-    "雪風": "ゆきかぜ",
-    "花車": "かしゃ",
-    "陽炎": "かげろう",
-    "嵐月": "らんげつ",
-    "断雲": "だんうん",
-    "天地": "てんち",
-    "春風": "はるかぜ",
-    "白虎": "びゃっこ",
-    "青龍": "せいりゅう",
-    "朱雀": "すざく",
-    "玄武": "げんぶ",
-    # 忍者忍術
-    "空蝉": "うつせみ",
-    "火遁": "かとん",
-    "水遁": "すいとん",
-    "風遁": "ふうとん",
-    "土遁": "どとん",
-    "雷遁": "らいとん",
-    "氷遁": "ひょうとん",
-    # 侍JA
-    "明鏡止水": "めいきょうしすい",
-    "黙想": "もくそう",
-    "八双": "はっそう",
-    "星眼": "せいがん",
-    "葉隠": "はがくれ",
-    "心眼": "しんがん",
-    # その他
-    "震天動地": "しんてんどうち",
-}
-
-# グローバルなpykakasiインスタンス（初期化コストが高いため1度だけ作成）
-_kakasi_instance = None
-
-def _text_to_hiragana(text: str) -> str:
-    """漢字・カタカナを含むテキストをひらがなに変換（読み仮名）
-    FFXI固有の読み方にも対応"""
-    global _kakasi_instance
-    
-    # カスタム辞書で完全一致を優先チェック
-    for kanji, hiragana in _FFXI_READING_DICT.items():
-        if kanji in text:
-            # 辞書の単語を含む場合、その部分を置き換えて処理
-            text = text.replace(kanji, hiragana)
-    
-    if _kakasi_instance is None:
-        try:
-            import pykakasi
-            _kakasi_instance = pykakasi.kakasi()
-        except ImportError:
-            # pykakasiがインストールされていない場合はカタカナ変換のみ
-            _kakasi_instance = False
-    
-    if _kakasi_instance is False:
-        # pykakasiが使えない場合はカタカナ→ひらがな変換のみ
-        return _katakana_to_hiragana(text)
-    
-    # 漢字・カタカナ・ひらがな すべてをひらがなに変換
-    try:
-        result = _kakasi_instance.convert(text)
-        hiragana_text = ''.join([item['hira'] for item in result])
-        return hiragana_text
-    except Exception:
-        # エラー時はカタカナ→ひらがな変換のみ
-        return _katakana_to_hiragana(text)
+# 読み仮名: DBの読み列（あれば）と、その場で変換した結果の LRU キャッシュ
+# 検索ワーカーのスレッドからも使うため、変換とキャッシュはロックで守る
+_READING_LOCK = threading.Lock()
+_READING_CACHE: "OrderedDict[str, str]" = OrderedDict()
+_READING_CACHE_SIZE = 8192
+_DB_READINGS: Optional[dict] = None
+
+
+def _db_readings() -> dict:
+    # sync_auto_tables.py で読み列を作ってあれば、DBの読みをそのまま使う
+    global _DB_READINGS
+    with _READING_LOCK:
+        if _DB_READINGS is None:
+            _DB_READINGS = load_readings() if callable(load_readings) else {}
+        return _DB_READINGS
+
+
+def _cached_reading(text_lower: str) -> str:
+    reading = _db_readings().get(text_lower)
+    if reading is not None:
+        return reading
+    with _READING_LOCK:
+        reading = _READING_CACHE.get(text_lower)
+        if reading is not None:
+            _READING_CACHE.move_to_end(text_lower)
+            return reading
+        reading = _text_to_hiragana(text_lower)
+        _READING_CACHE[text_lower] = reading
+        if len(_READING_CACHE) > _READING_CACHE_SIZE:
+            _READING_CACHE.popitem(last=False)
+    return reading
+
+
+class _AutoTransReadingIndex:
+    """Lowercased labels and hiragana readings of the auto-translate tree, as parallel arrays.
+
+    The arrays are filled by ``ensure_built`` on the search worker, not on the GUI thread.
+    """
+
+    def __init__(self, tree_data: list) -> None:
+        self._tree_data = tree_data
+        self._lock = threading.Lock()
+        self._built = False
+        self.category_lower: list[str] = []
+        self.category_reading: list[str] = []
+        self.entry_lower: list[list[str]] = []
+        self.entry_reading: list[list[str]] = []
+
+    def ensure_built(self) -> None:
+        with self._lock:
+            if self._built:
+                return
+            for cat in self._tree_data:
+                name_lower = cat["name"].lower()
+                self.category_lower.append(name_lower)
+                self.category_reading.append(_cached_reading(name_lower))
+                lowers = [entry.lower() for entry in cat["entries"]]
+                self.entry_lower.append(lowers)
+                self.entry_reading.append([_cached_reading(text) for text in lowers])
+            self._built = True
+
+
+def _search_autotrans(tree_data: list, index: _AutoTransReadingIndex, keyword_raw: str, is_stale, batch_size: int = 200):
+    """Yield ``[(label, value), ...]`` batches of entries matching ``keyword_raw``; stops once ``is_stale()``."""
+    keyword = keyword_raw.lower()
+    # ひらがな検索対応：キーワードをひらがなに変換
+    keyword_hiragana = _cached_reading(keyword)
+    has_kanji = any("一" <= ch <= "龯" or "㐀" <= ch <= "䶵" for ch in keyword_raw)
+    # 3文字以上なら項目の照合は DB の全文検索に任せる（使えなければ None で従来どおり走査）
+    fts_hits = None
+    if callable(match_auto_translates):
+        fts_hits = match_auto_translates(keyword_raw, "" if has_kanji else keyword_hiragana)
+
+    def _matches(text: str, text_lower: str, text_hiragana: str) -> bool:
+        """キーワードがテキストにマッチするか判定（ひらがな/漢字/カタカナ対応）"""
+        if has_kanji:
+            # 漢字入力時は表記一致のみ（読みヒットは無効化）
+            return keyword_raw in text or keyword_raw in text_lower
+        # 通常の検索 または 事前計算済みのひらがな読み仮名での検索
+        return keyword in text_lower or keyword_hiragana in text_hiragana
+
+    # 重複除去用のセット
+    seen_entries = set()
+    batch = []
+    for cat_no, cat in enumerate(tree_data):
+        if is_stale():
+            return
+        cat_hit = _matches(cat["name"], index.category_lower[cat_no], index.category_reading[cat_no])
+        lowers = index.entry_lower[cat_no]
+        readings = index.entry_reading[cat_no]
+        entry_ids = cat.get("entry_ids")
+        for entry_no, entry in enumerate(cat["entries"]):
+            if entry in seen_entries:
+                continue
+            if fts_hits is not None and entry_ids is not None:
+                hit = (cat["id"], entry_ids[entry_no]) in fts_hits
+            else:
+                hit = _matches(entry, lowers[entry_no], readings[entry_no])
+            if cat_hit or hit:
+                seen_entries.add(entry)
+                batch.append((f"{cat['name']} - {entry}", entry))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+    if batch:
+        yield batch
+
+
+class _AutoTransSearchWorker(QThread):
+    """Run one Ctrl+T search off the GUI thread, emitting results in batches."""
+
+    batch_ready = pyqtSignal(int, list)
+    done = pyqtSignal(int)
+
+    def __init__(self, generation: int, keyword: str, tree_data: list, index: _AutoTransReadingIndex, is_stale, parent=None):
+        super().__init__(parent)
+        self.generation = generation
+        self.keyword = keyword
+        self.tree_data = tree_data
+        self.index = index
+        self.is_stale = is_stale
+
+    def run(self) -> None:
+        self.index.ensure_built()
+        for batch in _search_autotrans(self.tree_data, self.index, self.keyword, self.is_stale):
+            self.batch_ready.emit(self.generation, batch)
+        self.done.emit(self.generation)
+
+
+class _SnippetListModel(QAbstractListModel):
+    """``(label, value)`` rows for the auto-translate entry list."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows: list[tuple[str, str]] = []
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or not (0 <= index.row() < len(self._rows)):
+            return None
+        label, value = self._rows[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return label
+        if role == Qt.ItemDataRole.UserRole:
+            return value
+        return None
+
+    def set_rows(self, rows: list) -> None:
+        self.beginResetModel()
+        self._rows = list(rows)
+        self.endResetModel()
+
+    def append_rows(self, rows: list) -> None:
+        if not rows:
+            return
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self._rows.extend(rows)
+        self.endInsertRows()
 
 
 class AutoTranslateDialog(QDialog):
+    SEARCH_DEBOUNCE_MS = 150
+
     def __init__(self, parent=None):
         super().__init__(parent)
         from ui_i18n import get_text
@@ -248,7 +353,10 @@ class AutoTranslateDialog(QDialog):
 
         body = QHBoxLayout()
         self.category_list = QListWidget()
-        self.entry_list = QListWidget()
+        self.entry_model = _SnippetListModel(self)
+        self.entry_list = QListView()
+        self.entry_list.setModel(self.entry_model)
+        self.entry_list.setUniformItemSizes(True)
         
         # 左: カテゴリ, 右: 定型文
         body.addWidget(self.category_list, 1)
@@ -264,13 +372,22 @@ class AutoTranslateDialog(QDialog):
         btn_row.addWidget(self.btn_cancel)
         layout.addLayout(btn_row)
 
+        # 入力が落ち着いてから検索し、古い検索結果は世代番号で捨てる
+        self._search_generation = 0
+        self._search_workers: list[_AutoTransSearchWorker] = []
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(self.SEARCH_DEBOUNCE_MS)
+        self._search_timer.timeout.connect(self._refresh_entries)
+
         self.btn_insert.clicked.connect(self.accept)
         self.btn_cancel.clicked.connect(self.reject)
-        self.entry_list.itemDoubleClicked.connect(lambda _: self.accept())
+        self.entry_list.doubleClicked.connect(lambda _: self.accept())
         self.category_list.currentRowChanged.connect(self._on_category_changed)
-        self.search_box.textChanged.connect(self._refresh_entries)
+        self.search_box.textChanged.connect(self._search_timer.start)
 
         self.tree_data = load_autotrans_tree() if callable(load_autotrans_tree) else []
+        self._reading_index = _AutoTransReadingIndex(self.tree_data)
         if self.tree_data:
             for cat in self.tree_data:
                 self.category_list.addItem(cat["name"])
@@ -288,64 +405,73 @@ class AutoTranslateDialog(QDialog):
         return bool(self.tree_data)
 
     def _on_category_changed(self, index: int):
-        self.entry_list.clear()
+        self.entry_model.set_rows([])
         if not (0 <= index < len(self.tree_data)):
             return
+        self._search_timer.stop()
         self._refresh_entries()
-        if self.entry_list.count() > 0:
-            self.entry_list.setCurrentRow(0)
+
+    def _select_first_row(self):
+        if self.entry_model.rowCount() > 0 and not self.entry_list.currentIndex().isValid():
+            self.entry_list.setCurrentIndex(self.entry_model.index(0))
 
     def _refresh_entries(self):
-        self.entry_list.clear()
+        # 実行中の検索はこの時点で古くなる
+        self._search_generation += 1
+        generation = self._search_generation
+        self.entry_model.set_rows([])
         index = self.category_list.currentRow()
         if not (0 <= index < len(self.tree_data)):
             return
         keyword_raw = self.search_box.text().strip()
-        keyword = keyword_raw.lower()
-        # ひらがな検索対応：キーワードをひらがなに変換
-        keyword_hiragana = _text_to_hiragana(keyword)
-        has_kanji = any("一" <= ch <= "龯" or "㐀" <= ch <= "䶵" for ch in keyword_raw)
-
-        # 重複除去用のセット
-        seen_entries = set()
-
-        def _add_item(label: str, value: str):
-            # 既に追加済みの項目はスキップ
-            if value in seen_entries:
-                return
-            seen_entries.add(value)
-            item = QListWidgetItem(label)
-            item.setData(Qt.ItemDataRole.UserRole, value)
-            self.entry_list.addItem(item)
-
-        def _matches(text: str) -> bool:
-            """キーワードがテキストにマッチするか判定（ひらがな/漢字/カタカナ対応）"""
-            text_lower = text.lower()
-            if has_kanji:
-                # 漢字入力時は表記一致のみ（読みヒットは無効化）
-                return keyword_raw in text or keyword_raw in text_lower
-            # テキスト全体（漢字含む）をひらがなに変換
-            text_hiragana = _text_to_hiragana(text_lower)
-            # 通常の検索 または ひらがな読み仮名での検索
-            return keyword in text_lower or keyword_hiragana in text_hiragana
-
-        if keyword:
-            for cat in self.tree_data:
-                for entry in cat["entries"]:
-                    if _matches(entry) or _matches(cat["name"]):
-                        _add_item(f"{cat['name']} - {entry}", entry)
+        if not keyword_raw:
+            seen_entries = set()
+            rows = []
+            for entry in self.tree_data[index]["entries"]:
+                if entry not in seen_entries:
+                    seen_entries.add(entry)
+                    rows.append((entry, entry))
+            self.entry_model.set_rows(rows)
+            self._select_first_row()
             return
 
-        if not (0 <= index < len(self.tree_data)):
+        worker = _AutoTransSearchWorker(
+            generation,
+            keyword_raw,
+            self.tree_data,
+            self._reading_index,
+            lambda: self._search_generation != generation,
+            self,
+        )
+        worker.batch_ready.connect(self._on_search_batch)
+        worker.finished.connect(lambda w=worker: self._on_worker_finished(w))
+        self._search_workers.append(worker)
+        worker.start()
+
+    def _on_search_batch(self, generation: int, rows: list):
+        if generation != self._search_generation:
             return
-        for entry in self.tree_data[index]["entries"]:
-            _add_item(entry, entry)
+        self.entry_model.append_rows(rows)
+        self._select_first_row()
+
+    def _on_worker_finished(self, worker: _AutoTransSearchWorker):
+        if worker in self._search_workers:
+            self._search_workers.remove(worker)
+        worker.deleteLater()
+
+    def done(self, result: int):
+        # 実行中の検索を打ち切ってからダイアログを閉じる
+        self._search_timer.stop()
+        self._search_generation += 1
+        for worker in list(self._search_workers):
+            worker.wait()
+        super().done(result)
 
     def selected_snippet(self) -> str:
-        item = self.entry_list.currentItem()
-        if not item:
+        index = self.entry_list.currentIndex()
+        if not index.isValid():
             return ""
-        raw = item.data(Qt.ItemDataRole.UserRole) or item.text()
+        raw = self.entry_model.data(index, Qt.ItemDataRole.UserRole) or self.entry_model.data(index)
         text = str(raw).strip()
         if not text:
             return ""
@@ -357,6 +483,300 @@ class AutoTranslateDialog(QDialog):
 
 
 
+# ========= アイテム定型文ブラウザ =========
+class _ItemListModel(QAbstractListModel):
+    """Lazily paged view over the ``items`` table; rows are fetched as the view scrolls."""
+
+    PAGE_SIZE = 200
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows: list[tuple[int, str]] = []
+        self._keyword = ""
+        self._exhausted = False
+
+    def set_keyword(self, keyword: str) -> None:
+        self.beginResetModel()
+        self._keyword = keyword.strip()
+        self._rows = []
+        self._exhausted = query_items is None
+        self.endResetModel()
+        if self.canFetchMore():
+            self.fetchMore()
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or not (0 <= index.row() < len(self._rows)):
+            return None
+        item_id, name = self._rows[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return name
+        if role == Qt.ItemDataRole.UserRole:
+            return item_id
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()) -> bool:
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()) -> None:
+        if parent.isValid() or self._exhausted:
+            return
+        # 直前ページの最後の id から続きを取る（OFFSET を使わないので深い位置でも一定時間）
+        after_id = self._rows[-1][0] if self._rows else -1
+        page = query_items(self._keyword, after_id=after_id, limit=self.PAGE_SIZE)
+        if len(page) < self.PAGE_SIZE:
+            self._exhausted = True
+        if not page:
+            return
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(page) - 1)
+        self._rows.extend(page)
+        self.endInsertRows()
+
+
+class ItemBrowserDialog(QDialog):
+    """Search and insert item auto-translate tokens from the full ``items`` table."""
+
+    SEARCH_DEBOUNCE_MS = 200
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(get_text("item_browser_title"))
+        self.resize(420, 480)
+        layout = QVBoxLayout(self)
+
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText(get_text("item_browser_placeholder"))
+        self.search_box.setClearButtonEnabled(True)
+        layout.addWidget(self.search_box)
+
+        self.model = _ItemListModel(self)
+        self.item_list = QListView()
+        self.item_list.setModel(self.model)
+        self.item_list.setUniformItemSizes(True)
+        layout.addWidget(self.item_list, 1)
+
+        btn_row = QHBoxLayout()
+        btn_row.addStretch()
+        self.btn_insert = QPushButton(get_text("btn_insert"))
+        self.btn_cancel = QPushButton(get_text("btn_close"))
+        btn_row.addWidget(self.btn_insert)
+        btn_row.addWidget(self.btn_cancel)
+        layout.addLayout(btn_row)
+
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(self.SEARCH_DEBOUNCE_MS)
+        self._search_timer.timeout.connect(self._apply_keyword)
+
+        self.btn_insert.clicked.connect(self.accept)
+        self.btn_cancel.clicked.connect(self.reject)
+        self.item_list.doubleClicked.connect(lambda _: self.accept())
+        self.search_box.textChanged.connect(self._search_timer.start)
+        self.search_box.returnPressed.connect(self._apply_keyword)
+
+        self._apply_keyword()
+
+    def has_data(self) -> bool:
+        return self.model.rowCount() > 0 or bool(self.search_box.text().strip())
+
+    def _apply_keyword(self):
+        self._search_timer.stop()
+        self.model.set_keyword(self.search_box.text())
+        if self.model.rowCount() > 0:
+            self.item_list.setCurrentIndex(self.model.index(0))
+
+    def selected_snippet(self) -> str:
+        index = self.item_list.currentIndex()
+        if not index.isValid():
+            return ""
+        name = str(self.model.data(index) or "").strip()
+        return f"<<{name}>>" if name else ""
+
+
+# ========= マクロ検索ダイアログ =========
+class MacroSearchDialog(QDialog):
+    """Live search over every macro of the current character; double-click jumps to it."""
+
+    RESULT_LIMIT = 200
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(get_text("search_title"))
+        self.resize(640, 420)
+        layout = QVBoxLayout(self)
+
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText(get_text("search_placeholder"))
+        self.search_box.setClearButtonEnabled(True)
+        layout.addWidget(self.search_box)
+
+        self.result_list = QListWidget()
+        layout.addWidget(self.result_list, 1)
+
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
+
+        self.search_box.textChanged.connect(self._run_search)
+        self.search_box.returnPressed.connect(self._jump_to_selected)
+        self.result_list.itemActivated.connect(lambda _: self._jump_to_selected())
+
+    def _repo(self):
+        parent = self.parent()
+        return getattr(parent, "repo", None) if parent else None
+
+    def _run_search(self):
+        self.result_list.clear()
+        repo = self._repo()
+        query = self.search_box.text().strip()
+        if not repo or not query:
+            self.status_label.setText("")
+            return
+        if not repo.has_search_index and repo.search_index_building:
+            # 索引の作成が終わると on_index_ready から再検索する
+            self.status_label.setText(get_text("search_indexing"))
+            return
+        hits = repo.search(query, limit=self.RESULT_LIMIT)
+        for hit in hits:
+            book_name = repo.books[hit.book_idx].name.strip()
+            book_label = f"Book{hit.book_idx + 1}" + (f" {book_name}" if book_name else "")
+            side_label = "Ctrl" if hit.side == "ctrl" else "Alt"
+            location = f"{book_label} / Set{hit.set_idx + 1} / {side_label}{hit.macro_idx + 1}"
+            item = QListWidgetItem(f"{location}  [{hit.name}]  {hit.text}")
+            item.setData(Qt.ItemDataRole.UserRole, (hit.book_idx, hit.set_idx, hit.side, hit.macro_idx))
+            self.result_list.addItem(item)
+        if hits:
+            self.result_list.setCurrentRow(0)
+            self.status_label.setText(get_text("search_result_count").format(count=len(hits)))
+        else:
+            self.status_label.setText(get_text("search_no_results"))
+
+    def on_index_ready(self):
+        if self.isVisible() and self.search_box.text().strip():
+            self._run_search()
+
+    def _jump_to_selected(self):
+        item = self.result_list.currentItem()
+        parent = self.parent()
+        if not item or not parent or not hasattr(parent, "jump_to_macro"):
+            return
+        book_idx, set_idx, side, macro_idx = item.data(Qt.ItemDataRole.UserRole)
+        parent.jump_to_macro(book_idx, set_idx, side, macro_idx)
+
+
+# ========= 一括置換ダイアログ =========
+class FindReplaceDialog(QDialog):
+    """Preview and apply a repository-wide replace as one save and one undo step."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(get_text("replace_title"))
+        self.resize(720, 480)
+        self._edits = []
+        layout = QVBoxLayout(self)
+
+        form = QHBoxLayout()
+        self.find_box = QLineEdit()
+        self.find_box.setPlaceholderText(get_text("replace_find"))
+        self.replace_box = QLineEdit()
+        self.replace_box.setPlaceholderText(get_text("replace_with"))
+        form.addWidget(self.find_box, 1)
+        form.addWidget(self.replace_box, 1)
+        layout.addLayout(form)
+
+        options = QHBoxLayout()
+        self.mode_combo = QComboBox()
+        self.mode_combo.addItem(get_text("replace_mode_plain"), "plain")
+        self.mode_combo.addItem(get_text("replace_mode_regex"), "regex")
+        self.mode_combo.addItem(get_text("replace_mode_autotrans"), "autotrans")
+        self.case_check = QCheckBox(get_text("replace_case_sensitive"))
+        self.names_check = QCheckBox(get_text("replace_include_names"))
+        options.addWidget(self.mode_combo)
+        options.addWidget(self.case_check)
+        options.addWidget(self.names_check)
+        options.addStretch()
+        self.btn_preview = QPushButton(get_text("replace_preview"))
+        options.addWidget(self.btn_preview)
+        layout.addLayout(options)
+
+        self.preview_list = QListWidget()
+        layout.addWidget(self.preview_list, 1)
+
+        btn_row = QHBoxLayout()
+        self.status_label = QLabel("")
+        btn_row.addWidget(self.status_label, 1)
+        self.btn_apply = QPushButton(get_text("replace_apply"))
+        self.btn_apply.setEnabled(False)
+        self.btn_close = QPushButton(get_text("btn_close"))
+        btn_row.addWidget(self.btn_apply)
+        btn_row.addWidget(self.btn_close)
+        layout.addLayout(btn_row)
+
+        self.btn_preview.clicked.connect(self._on_preview)
+        self.btn_apply.clicked.connect(self._on_apply)
+        self.btn_close.clicked.connect(self.reject)
+        # 条件を変えたら古いプレビューは適用させない
+        for signal in (
+            self.find_box.textChanged,
+            self.replace_box.textChanged,
+            self.mode_combo.currentIndexChanged,
+            self.case_check.toggled,
+            self.names_check.toggled,
+        ):
+            signal.connect(self._invalidate_preview)
+
+    def _repo(self):
+        parent = self.parent()
+        return getattr(parent, "repo", None) if parent else None
+
+    def _invalidate_preview(self, *_):
+        self._edits = []
+        self.btn_apply.setEnabled(False)
+
+    def _on_preview(self):
+        repo = self._repo()
+        self.preview_list.clear()
+        self._invalidate_preview()
+        if not repo or not self.find_box.text():
+            return
+        parent = self.parent()
+        if hasattr(parent, "_save_current_macro_to_memory"):
+            parent._save_current_macro_to_memory()
+        try:
+            edits = repo.find_replacements(
+                self.find_box.text(),
+                self.replace_box.text(),
+                mode=self.mode_combo.currentData(),
+                case_sensitive=self.case_check.isChecked(),
+                include_names=self.names_check.isChecked(),
+            )
+        except re.error as exc:
+            QMessageBox.warning(self, get_text("replace_title"), f"{get_text('replace_regex_error')} {exc}")
+            return
+        for edit in edits:
+            side_label = "Ctrl" if edit.side == "ctrl" else "Alt"
+            line_label = get_text("label_macro_name").rstrip(":") if edit.line_idx < 0 else f"L{edit.line_idx + 1}"
+            location = f"Book{edit.book_idx + 1} / Set{edit.set_idx + 1} / {side_label}{edit.macro_idx + 1} {line_label}"
+            self.preview_list.addItem(f"{location}:  {edit.before}  →  {edit.after}")
+        self._edits = edits
+        self.btn_apply.setEnabled(bool(edits))
+        self.status_label.setText(get_text("replace_preview_count").format(count=len(edits)))
+
+    def _on_apply(self):
+        repo = self._repo()
+        if not repo or not self._edits:
+            return
+        applied = repo.apply_replacements(self._edits, save=True)
+        self._invalidate_preview()
+        self.preview_list.clear()
+        self.status_label.setText(get_text("replace_applied_count").format(count=applied))
+        parent = self.parent()
+        if hasattr(parent, "_after_history_step"):
+            parent._after_history_step()
+
+
 class ExportCenterDialog(QDialog):
     """Launcher-style dialog that summarizes export-related information."""
 
@@ -621,8 +1041,18 @@ class ExportCenterDialog(QDialog):
             return
 
         try:
-            self._copy_to_ffxi(source, target_path)
-            QMessageBox.information(self, get_text("dlg_copy_complete"), get_text("msg_copy_complete").format(target=target_path))
+            report = self._copy_to_ffxi(source, target_path)
+            if not report.ok:
+                details = "\n".join(f"{name}: {error}" for name, error in report.failed[:10])
+                key = "msg_copy_failed_permission" if report.permission_denied else "msg_copy_failed"
+                QMessageBox.warning(self, get_text("dlg_copy_failed"), get_text(key).format(error=details))
+                return
+            self._update_import_base(target_path)
+            message = get_text("msg_copy_complete").format(target=target_path)
+            message += "\n\n" + get_text("msg_copy_report").format(
+                copied=len(report.copied), unchanged=len(report.unchanged)
+            )
+            QMessageBox.information(self, get_text("dlg_copy_complete"), message)
         except PermissionError as exc:
             QMessageBox.warning(
                 self,
@@ -632,54 +1062,83 @@ class ExportCenterDialog(QDialog):
         except Exception as exc:
             QMessageBox.warning(self, get_text("dlg_copy_failed"), get_text("msg_copy_failed").format(error=exc))
 
-    def _copy_to_ffxi(self, source: Path, destination: Path | None = None) -> None:
+    def _update_import_base(self, target: Path) -> None:
+        # コピー後のUSERフォルダを次回取り込み時の3-wayマージの基準にする
+        if ffxi_mcr is None or not self.repo:
+            return
+        try:
+            self.repo.save_import_base(ffxi_mcr.import_ffxi_macros(target))
+        except Exception as e:
+            print(f"Import base update failed: {e}")
+
+    def _copy_to_ffxi(self, source: Path, destination: Path | None = None):
         target = destination
         if target is None:
             if storage is None:
                 raise RuntimeError("storage モジュールが利用できません。")
             target = storage.ffxi_user_root() / self.character_id
-        target.mkdir(parents=True, exist_ok=True)
-        
-        copied_files = []
-        for item in source.iterdir():
-            if not item.is_file():
-                continue
-            name = item.name.lower()
-            # .dat ファイルまたは .ttl ファイルのみコピー
-            is_dat = name.startswith("mcr") and name.endswith(".dat")
-            is_ttl = name in {"mcr.ttl", "mcr_2.ttl"}
-            if not (is_dat or is_ttl):
-                continue
-            dest = target / item.name
-            
-            # コピー前のファイルサイズ
-            src_size = item.stat().st_size
-            
-            # コピー先のファイルが読み取り専用なら解除する
-            if dest.exists():
-                try:
-                    import stat
-                    os.chmod(dest, stat.S_IWRITE)
-                except Exception as e:
-                    print(f"警告: {item.name} の属性変更に失敗しました: {e}")
-
-            # ファイルをコピー
-            shutil.copy2(item, dest)
-            
-            # コピー後の検証
-            if dest.exists():
-                dest_size = dest.stat().st_size
-                if src_size == dest_size:
-                    copied_files.append(f"{item.name} ({src_size} bytes)")
-                else:
-                    print(f"警告: {item.name} のサイズが一致しません (元: {src_size}, 先: {dest_size})")
-            else:
-                print(f"エラー: {item.name} のコピーに失敗しました")
-        
-        if copied_files:
-            print(f"コピー完了: {len(copied_files)} ファイル")
-            for f in copied_files:
-                print(f"  - {f}")
+
+        # 内容が同じファイルは書き込まず、差分のあるファイルだけを置き換える
+        report = storage.sync_macro_files(source, target)
+        print(f"コピー完了: {len(report.copied)} ファイル (変更なし {len(report.unchanged)})")
+        for name in report.copied:
+            print(f"  - {name}")
+        for name, error in report.failed:
+            print(f"エラー: {name} のコピーに失敗しました: {error}")
+        return report
+
+
+# ========= 起動時バックアップ =========
+class StartupBackupWorker(QThread):
+    """Run storage.backup_and_prepare_edit off the GUI thread."""
+
+    progress = pyqtSignal(int, int)
+    completed = pyqtSignal(list)
+    failed = pyqtSignal(str)
+
+    def run(self) -> None:
+        try:
+            backed = storage.backup_and_prepare_edit(progress=self._report)
+        except Exception as exc:
+            self.failed.emit(str(exc))
+            return
+        self.completed.emit(backed)
+
+    def _report(self, done: int, total: int) -> None:
+        # 毎ファイル通知するとイベントが溢れるので間引く
+        if done == total or done % 20 == 0:
+            self.progress.emit(done, total)
+
+
+# ========= 検索インデックス・入力補完の集計 =========
+class RepositoryIndexWorker(QThread):
+    """Build a repository's search index and completion usage from a snapshot off the GUI thread."""
+
+    built = pyqtSignal(object, object, object)
+
+    def __init__(self, repo: MacroRepository, search: bool, usage: bool, parent=None):
+        super().__init__(parent)
+        self._repo = repo
+        self._search = search
+        self._usage = usage
+        # スナップショットは不変なので、作業スレッドから安全に読める
+        self._books = repo.begin_search_index_build() if search else repo.snapshot_books()
+
+    def run(self) -> None:
+        index = MacroRepository.build_search_index(self._books) if self._search else None
+        tracker = None
+        if self._usage and UsageTracker is not None:
+            tracker = UsageTracker.build(
+                ((book_idx, set_idx, side, macro_idx), macro.lines)
+                for book_idx, book in enumerate(self._books)
+                for set_idx, macro_set in enumerate(book.sets)
+                for side in ("ctrl", "alt")
+                for macro_idx, macro in enumerate(getattr(macro_set, side))
+                if any(macro.lines)
+            )
+        self.built.emit(self._repo, index, tracker)
+
+
 # ========= メインウィンドウ =========
 class VanaMacroUI(QMainWindow):
     def __init__(self):
@@ -699,6 +1158,13 @@ class VanaMacroUI(QMainWindow):
         # クリップボード（Set/Book）
         self._set_clipboard = None
         self._book_clipboard = None
+        self._search_dialog: MacroSearchDialog | None = None
+        self._backup_worker: StartupBackupWorker | None = None
+        self._index_workers: list[RepositoryIndexWorker] = []
+        # 入力補完用の使用回数（リポジトリごと）
+        self._usage_trackers: "weakref.WeakKeyDictionary[MacroRepository, object]" = weakref.WeakKeyDictionary()
+        # 集計中のリポジトリ -> その間に変更されたマクロのアドレス
+        self._usage_pending: "weakref.WeakKeyDictionary[MacroRepository, set]" = weakref.WeakKeyDictionary()
 
         # UI補助
         self.theme_combo: QComboBox | None = None
@@ -893,6 +1359,10 @@ class VanaMacroUI(QMainWindow):
         for le in self.macro_lines:
             le.textChanged.connect(self.on_lines_join_to_bulk)
             le.textChanged.connect(self._mark_dirty)
+        # 一括エディタ側で変更された行番号の範囲（6行への反映をその行だけに絞る）
+        self._bulk_dirty_blocks: tuple[int, int] | None = None
+        self._bulk_block_count = self.bulk_editor.document().blockCount()
+        self.bulk_editor.document().contentsChange.connect(self._on_bulk_contents_change)
         self.bulk_editor.textChanged.connect(self.on_bulk_apply_to_lines)
         self.bulk_editor.textChanged.connect(self._mark_dirty)
 
@@ -964,10 +1434,16 @@ class VanaMacroUI(QMainWindow):
 
     def closeEvent(self, event):
         """ウィンドウを閉じる際に設定を保存"""
-        if not self._check_unsaved_changes():
+        if not self._check_unsaved_changes(leaving=True):
             event.ignore()
             return
         self._save_settings()
+        repository_cache.flush()
+        if self._backup_worker is not None:
+            # バックアップ途中で終了すると data/edit が中途半端になるため完了を待つ
+            self._backup_worker.wait()
+        for worker in list(self._index_workers):
+            worker.wait()
         super().closeEvent(event)
 
     # ====== 共通：現在モード＆モード変更 ======
@@ -1133,6 +1609,26 @@ class VanaMacroUI(QMainWindow):
         target.setFocus()
         self._insert_text_into_widget(target, snippet, snapshot)
 
+    def on_insert_item_autotrans(self):
+        if query_items is None:
+            QMessageBox.information(self, get_text("item_browser_title"), get_text("autotrans_no_data"))
+            return
+        target = self._current_text_widget()
+        if not target:
+            return
+        snapshot = self._cursor_snapshot(target)
+        dlg = ItemBrowserDialog(self)
+        if not dlg.has_data():
+            QMessageBox.warning(self, get_text("item_browser_title"), get_text("autotrans_no_data"))
+            return
+        if dlg.exec() != QDialog.DialogCode.Accepted:
+            return
+        snippet = dlg.selected_snippet()
+        if not snippet:
+            return
+        target.setFocus()
+        self._insert_text_into_widget(target, snippet, snapshot)
+
     def _refresh_set_button_labels(self):
         """Setボタンに Set名（空なら SetN）を表示。"""
         if not self.repo:
@@ -1237,12 +1733,14 @@ class VanaMacroUI(QMainWindow):
         self.action_import_menu = QAction(get_text("action_import") + "...", self)
         self.action_import_menu.setShortcut(QKeySequence("Ctrl+I"))
         self.action_import_menu.triggered.connect(self.on_ffxi_import)
+        self.action_import_menu.setEnabled(not self._backup_running())
         file_menu.addAction(self.action_import_menu)
 
-        action_export_center = QAction(get_text("action_export_center"), self)
-        action_export_center.setShortcut(QKeySequence("Ctrl+E"))
-        action_export_center.triggered.connect(self.on_open_export_center)
-        file_menu.addAction(action_export_center)
+        self.action_export_menu = QAction(get_text("action_export_center"), self)
+        self.action_export_menu.setShortcut(QKeySequence("Ctrl+E"))
+        self.action_export_menu.triggered.connect(self.on_open_export_center)
+        self.action_export_menu.setEnabled(not self._backup_running())
+        file_menu.addAction(self.action_export_menu)
 
         file_menu.addSeparator()
         action_exit = QAction(get_text("action_exit"), self)
@@ -1251,6 +1749,24 @@ class VanaMacroUI(QMainWindow):
         file_menu.addAction(action_exit)
 
         edit_menu = menu_bar.addMenu(get_text("menu_edit"))
+        self.action_undo = QAction(get_text("action_undo"), self)
+        self.action_undo.setShortcut(QKeySequence("Ctrl+Z"))
+        self.action_undo.triggered.connect(self.on_undo)
+        edit_menu.addAction(self.action_undo)
+        self.action_redo = QAction(get_text("action_redo"), self)
+        self.action_redo.setShortcut(QKeySequence("Ctrl+Y"))
+        self.action_redo.triggered.connect(self.on_redo)
+        edit_menu.addAction(self.action_redo)
+        edit_menu.addSeparator()
+        action_search = QAction(get_text("action_search"), self)
+        action_search.setShortcut(QKeySequence("Ctrl+F"))
+        action_search.triggered.connect(self.on_open_search)
+        edit_menu.addAction(action_search)
+        action_replace = QAction(get_text("action_replace"), self)
+        action_replace.setShortcut(QKeySequence("Ctrl+H"))
+        action_replace.triggered.connect(self.on_open_replace)
+        edit_menu.addAction(action_replace)
+        edit_menu.addSeparator()
 
         book_menu = edit_menu.addMenu(get_text("menu_book"))
         action_book_rename = QAction(get_text("action_rename"), self)
@@ -1330,6 +1846,11 @@ class VanaMacroUI(QMainWindow):
         self.action_autotrans_menu.triggered.connect(self.on_insert_autotrans)
         macro_menu.addAction(self.action_autotrans_menu)
 
+        self.action_item_browser_menu = QAction(get_text("action_item_browser"), self)
+        self.action_item_browser_menu.setShortcut(QKeySequence("Ctrl+Shift+T"))
+        self.action_item_browser_menu.triggered.connect(self.on_insert_item_autotrans)
+        macro_menu.addAction(self.action_item_browser_menu)
+
         tools_menu = menu_bar.addMenu(get_text("menu_tools"))
         action_char_manager = QAction(get_text("action_char_manage"), self)
         action_char_manager.triggered.connect(self.on_open_char_manager)
@@ -1408,16 +1929,19 @@ class VanaMacroUI(QMainWindow):
         )
 
     # ====== Book 操作 ======
+    def _book_label(self, i: int) -> str:
+        label = f"Book {i+1}"
+        if self.repo and 0 <= i < len(self.repo.books):
+            nm = self.repo.books[i].name.strip()
+            if nm:
+                label = f"{label} — {nm}"
+        return label
+
     def refresh_books(self):
         self.book_list.blockSignals(True)
         self.book_list.clear()
         for i in range(40):
-            label = f"Book {i+1}"
-            if self.repo and 0 <= i < len(self.repo.books):
-                nm = self.repo.books[i].name.strip()
-                if nm:
-                    label = f"{label} — {nm}"
-            self.book_list.addItem(label)
+            self.book_list.addItem(self._book_label(i))
         self.book_list.blockSignals(False)
         self.book_list.setCurrentRow(self.current_book_index)
         self._refresh_set_button_labels()
@@ -1426,15 +1950,14 @@ class VanaMacroUI(QMainWindow):
         if not self.repo:
             return
         b = self.current_book_index
-        self._book_clipboard = copy.deepcopy(self.repo.books[b].to_dict())
+        self._book_clipboard = self.repo.snapshot_book(b)
         self.statusBar().showMessage(get_text("status_copied"), 1000)
 
     def on_book_paste(self):
         if not self.repo or not self._book_clipboard:
             return
         b = self.current_book_index
-        self.repo.books[b] = MacroBook.from_dict(copy.deepcopy(self._book_clipboard))
-        self.repo.save()
+        self.repo.restore_book(b, self._book_clipboard)
         self.refresh_books(); self._reload_current_macro_into_editor(); self._refresh_set_button_labels(); self._refresh_macro_button_labels()
         self.statusBar().showMessage(get_text("status_pasted"), 1000)
 
@@ -1442,9 +1965,7 @@ class VanaMacroUI(QMainWindow):
         if not self.repo:
             return
         b = self.current_book_index
-        self.repo.books[b] = MacroBook()
-        self.repo.books[b].name = f"Book{b+1}"
-        self.repo.save()
+        self.repo.clear_book(b, name=f"Book{b+1}")
         self.refresh_books(); self._reload_current_macro_into_editor(); self._refresh_set_button_labels(); self._refresh_macro_button_labels()
         self.statusBar().showMessage(get_text("status_cleared"), 1000)
 
@@ -1462,15 +1983,14 @@ class VanaMacroUI(QMainWindow):
         if not self.repo:
             return
         b, s = self.current_book_index, self.current_set_index
-        self._set_clipboard = copy.deepcopy(self.repo.books[b].sets[s].to_dict())
+        self._set_clipboard = self.repo.snapshot_set(b, s)
         self.statusBar().showMessage(get_text("status_copied"), 1000)
 
     def on_set_paste(self):
         if not self.repo or not self._set_clipboard:
             return
         b, s = self.current_book_index, self.current_set_index
-        self.repo.books[b].sets[s] = MacroSet.from_dict(copy.deepcopy(self._set_clipboard))
-        self.repo.save()
+        self.repo.restore_set(b, s, self._set_clipboard)
         self._reload_current_macro_into_editor(); self._refresh_set_button_labels(); self._refresh_macro_button_labels()
         self.statusBar().showMessage(get_text("status_pasted"), 1000)
 
@@ -1478,8 +1998,7 @@ class VanaMacroUI(QMainWindow):
         if not self.repo:
             return
         b, s = self.current_book_index, self.current_set_index
-        self.repo.books[b].sets[s] = MacroSet()
-        self.repo.save()
+        self.repo.clear_set(b, s)
         self._reload_current_macro_into_editor(); self._refresh_set_button_labels(); self._refresh_macro_button_labels()
         self.statusBar().showMessage(get_text("status_cleared"), 1000)
 
@@ -1497,6 +2016,56 @@ class VanaMacroUI(QMainWindow):
             self.repo.rename_set(self.current_book_index, self.current_set_index, text)
             self._refresh_set_button_labels()
 
+    # ====== 元に戻す / やり直し ======
+    # テキスト入力欄にフォーカスがある間は各ウィジェット自身の Ctrl+Z が優先される
+    def on_undo(self):
+        if not self.repo:
+            return
+        # 未保存の編集内容も1ステップとして履歴に載せてから戻す
+        self._save_current_macro_to_memory()
+        if self.repo.undo() is None:
+            return
+        self._after_history_step()
+        self.statusBar().showMessage(get_text("status_undone"), 1000)
+
+    def on_redo(self):
+        if not self.repo:
+            return
+        self._save_current_macro_to_memory()
+        if self.repo.redo() is None:
+            return
+        self._after_history_step()
+        self.statusBar().showMessage(get_text("status_redone"), 1000)
+
+    def _after_history_step(self):
+        self._dirty = False
+        self.refresh_books(); self._reload_current_macro_into_editor(); self._refresh_set_button_labels(); self._refresh_macro_button_labels()
+
+    # ====== 検索 ======
+    def on_open_search(self):
+        if self._search_dialog is None:
+            self._search_dialog = MacroSearchDialog(self)
+        self._search_dialog.show()
+        self._search_dialog.raise_()
+        self._search_dialog.activateWindow()
+        self._search_dialog.search_box.setFocus()
+        self._search_dialog.search_box.selectAll()
+
+    def on_open_replace(self):
+        if not self.repo:
+            return
+        dlg = FindReplaceDialog(self)
+        dlg.exec()
+
+    def jump_to_macro(self, book_idx: int, set_idx: int, side: str, macro_idx: int):
+        """検索結果などから指定位置のマクロを開く"""
+        if not self.repo or not self._check_unsaved_changes():
+            return
+        if book_idx != self.current_book_index:
+            self.book_list.setCurrentRow(book_idx)
+        self.on_set_changed(set_idx)
+        self.on_macro_selected(side, macro_idx)
+
     # ====== マクロ操作 ======
     def on_macro_save(self):
         if not self.current_slot or not self.controller:
@@ -1598,19 +2167,39 @@ class VanaMacroUI(QMainWindow):
             self._macro_syncing = False
 
     # ====== 一括テキスト ⇄ 6行 ======
+    def _on_bulk_contents_change(self, position: int, removed: int, added: int):
+        if getattr(self, "_macro_syncing", False):
+            return
+        doc = self.bulk_editor.document()
+        first = doc.findBlock(position).blockNumber()
+        last = doc.findBlock(position + added).blockNumber()
+        if last < 0:
+            last = doc.blockCount() - 1
+        if self._bulk_dirty_blocks is not None:
+            first = min(first, self._bulk_dirty_blocks[0])
+            last = max(last, self._bulk_dirty_blocks[1])
+        self._bulk_dirty_blocks = (first, last)
+
     def on_bulk_apply_to_lines(self):
+        doc = self.bulk_editor.document()
         if getattr(self, "_macro_syncing", False):
+            # プログラム側からの書き換えでも行数の基準だけは更新しておく
+            self._bulk_block_count = doc.blockCount()
             return
+        dirty = self._bulk_dirty_blocks
+        self._bulk_dirty_blocks = None
+        block_count = doc.blockCount()
+        # 行数が変わった場合は以降の行がずれるので6行すべてを照合する
+        if dirty is None or block_count != self._bulk_block_count:
+            first, last = 0, 5
+        else:
+            first, last = dirty[0], min(dirty[1], 5)
+        self._bulk_block_count = block_count
         self._macro_syncing = True
         try:
-            text = (
-                self.bulk_editor.toPlainText()
-                .replace("\r\n", "\n")
-                .replace("\r", "\n")
-            )
-            parts = text.split("\n")
-            for i in range(6):
-                new_val = parts[i] if i < len(parts) else ""
+            for i in range(first, last + 1):
+                block = doc.findBlockByNumber(i)
+                new_val = block.text() if block.isValid() else ""
                 if self.macro_lines[i].text() != new_val:
                     self.macro_lines[i].setText(new_val)
         finally:
@@ -1619,12 +2208,25 @@ class VanaMacroUI(QMainWindow):
     def on_lines_join_to_bulk(self, _text=None):
         if getattr(self, "_macro_syncing", False):
             return
+        doc = self.bulk_editor.document()
+        sender = self.sender()
+        index = self.macro_lines.index(sender) if sender in self.macro_lines else -1
         self._macro_syncing = True
         try:
-            joined = "\n".join(le.text() for le in self.macro_lines)
-            if self.bulk_editor.toPlainText() != joined:
-                self.bulk_editor.setPlainText(joined)
+            if index >= 0 and doc.blockCount() == 6:
+                # 変更された1行だけを一括エディタの該当ブロックに書き込む
+                new_val = self.macro_lines[index].text()
+                block = doc.findBlockByNumber(index)
+                if block.text() != new_val:
+                    cursor = QTextCursor(block)
+                    cursor.movePosition(QTextCursor.MoveOperation.EndOfBlock, QTextCursor.MoveMode.KeepAnchor)
+                    cursor.insertText(new_val)
+            else:
+                joined = "\n".join(le.text() for le in self.macro_lines)
+                if self.bulk_editor.toPlainText() != joined:
+                    self.bulk_editor.setPlainText(joined)
         finally:
+            self._bulk_block_count = doc.blockCount()
             self._macro_syncing = False
 
     # ====== キャラ関連 ======
@@ -1677,8 +2279,9 @@ class VanaMacroUI(QMainWindow):
             save=False
         )
 
-    def _check_unsaved_changes(self) -> bool:
+    def _check_unsaved_changes(self, leaving: bool = False) -> bool:
         """未保存の変更があるか確認し、あれば保存するか尋ねる。
+        leaving: このキャラから離れる（キャラ切替・終了）場合は True
         Return:
             True: 処理続行（保存した、または保存不要、または破棄を選択）
             False: キャンセル（移動中止）
@@ -1705,12 +2308,53 @@ class VanaMacroUI(QMainWindow):
             return True
         elif ret == QMessageBox.StandardButton.No:
             self._dirty = False # 破棄
+            if leaving:
+                # 破棄した変更がキャッシュ経由で復活しないよう、次回はJSONから読み直させる
+                repository_cache.discard(self.repo)
+            else:
+                # 同じキャラで作業を続けるので、JSONの内容に戻してキャッシュにも入れ直す
+                self._revert_repo()
             return True
         else:
             return False
 
+    def _revert_repo(self) -> None:
+        """未保存の変更を捨て、現在のキャラをJSONから読み直して表示し直す"""
+        self.repo = repository_cache.reload(self.repo)
+        side, macro_idx = self.current_slot or ("ctrl", 0)
+        self.controller = MacroController(self.repo)
+        self.controller.book_idx = self.current_book_index
+        self.controller.set_idx = self.current_set_index
+        self.controller.side = side
+        self.controller.macro_idx = macro_idx
+        # 呼び出し元（Book切替など）の選択を動かさないよう、ラベルだけ差し替える
+        for i in range(self.book_list.count()):
+            self.book_list.item(i).setText(self._book_label(i))
+        self._refresh_set_button_labels(); self._reload_current_macro_into_editor(); self._refresh_macro_button_labels()
+        self._refresh_completion_usage()
+        self._start_repo_indexing()
+        try:
+            self._set_macro_paste_enabled(self.repo.can_paste())
+        except Exception:
+            pass
+
+    def _resolve_stale_repo(self, repo: MacroRepository) -> bool:
+        """キャッシュ中の未保存の変更と、外部で更新されたJSONのどちらを使うか尋ねる（True = ディスク）"""
+        ret = QMessageBox.question(
+            self,
+            get_text("dlg_stale_repo_title"),
+            get_text("msg_stale_repo").format(path=repo.json_path),
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+            QMessageBox.StandardButton.No,
+        )
+        if ret == QMessageBox.StandardButton.Yes:
+            # 読み直す前に、破棄されるメモリ上の状態を控えておく
+            repo.save_checkpoint("stale")
+            return True
+        return False
+
     def on_character_changed(self, _index: int):
-        if not self._check_unsaved_changes():
+        if not self._check_unsaved_changes(leaving=True):
             self.character_combo.blockSignals(True)
             if self.repo:
                 idx = self.character_combo.findData(self.repo.character_id)
@@ -1720,7 +2364,7 @@ class VanaMacroUI(QMainWindow):
             return
 
         cid = self.character_combo.currentData() or "sample1"
-        self.repo = MacroRepository.load_or_create(character_id=str(cid))
+        self.repo = repository_cache.get(str(cid), resolve_stale=self._resolve_stale_repo)
         self.controller = MacroController(self.repo)
         self.controller.book_idx = self.current_book_index
         self.controller.set_idx = self.current_set_index
@@ -1728,13 +2372,39 @@ class VanaMacroUI(QMainWindow):
         self.controller.macro_idx = 0
         self.current_slot = ("ctrl", 0)
         self.refresh_books(); self._refresh_set_button_labels(); self._reload_current_macro_into_editor(); self._refresh_macro_button_labels()
+        self._refresh_completion_usage()
+        self._start_repo_indexing()
         try:
             self._set_macro_paste_enabled(self.repo.can_paste())
         except Exception:
             pass
 
+    def _refresh_completion_usage(self):
+        """キャラのマクロ全体の使用回数を入力補完の並び順に反映
+
+        集計はリポジトリごとに1回だけ作業スレッドで行い、以降はマクロの変更ごとに差分で更新する。
+        集計が終わるまでは使用回数なしで並べる。
+        """
+        repo = self.repo
+        if not repo or UsageTracker is None:
+            return
+        tracker = self._usage_trackers.get(repo)
+        set_completion_usage(tracker.counts if tracker is not None else {})
+
+    def _on_repo_macro_changed(self, repo: MacroRepository, address) -> None:
+        pending = self._usage_pending.get(repo)
+        if pending is not None:
+            pending.add(address)
+            return
+        tracker = self._usage_trackers.get(repo)
+        if tracker is None:
+            return
+        macro = repo.books[address[0]].sets[address[1]].get(address[2], address[3])
+        if tracker.update(address, macro.lines) and repo is self.repo:
+            completion_usage_changed()
+
     def on_open_char_manager(self):
-        if not self._check_unsaved_changes():
+        if not self._check_unsaved_changes(leaving=True):
             return
         before_id = self.character_combo.currentData()
         dlg = CharacterManageDialog(self)
@@ -1799,6 +2469,10 @@ class VanaMacroUI(QMainWindow):
         self._build_menu_bar()
 
     def on_open_export_center(self):
+        if self._backup_running():
+            # テンプレートの解決に data/edit が必要なため、バックアップ完了まで待ってもらう
+            QMessageBox.information(self, get_text("dlg_export"), get_text("msg_backup_in_progress"))
+            return
         if not self._check_unsaved_changes():
             return
         cid = self.character_combo.currentData()
@@ -1834,7 +2508,132 @@ class VanaMacroUI(QMainWindow):
 
 
     # ====== FFXI 取り込み（枠） ======
+    # ====== 起動時バックアップ ======
+    def start_startup_backup(self) -> None:
+        """Back up the USER folder in the background; import waits until data/edit is ready."""
+        if storage is None or self._backup_worker is not None:
+            return
+        storage.mark_edit_pending()
+        worker = StartupBackupWorker(self)
+        worker.progress.connect(self._on_backup_progress)
+        worker.completed.connect(self._on_backup_completed)
+        worker.failed.connect(self._on_backup_failed)
+        worker.finished.connect(self._on_backup_finished)
+        self._backup_worker = worker
+        self._set_backup_gated_enabled(False)
+        self.statusBar().showMessage(get_text("status_backup_started"))
+        worker.start()
+
+    def _backup_running(self) -> bool:
+        return self._backup_worker is not None
+
+    def _set_backup_gated_enabled(self, enabled: bool) -> None:
+        """取り込みとエクスポートは data/edit を使うため、バックアップ中は無効にする"""
+        self.btn_import.setEnabled(enabled)
+        self.action_import_menu.setEnabled(enabled)
+        self.btn_export_center.setEnabled(enabled)
+        self.action_export_menu.setEnabled(enabled)
+
+    def _on_backup_progress(self, done: int, total: int) -> None:
+        self.statusBar().showMessage(get_text("status_backup_progress").format(done=done, total=total))
+
+    def _on_backup_completed(self, backed: list) -> None:
+        if backed:
+            print(f"バックアップ準備完了: {backed}")
+            self.statusBar().showMessage(get_text("status_backup_done"), 3000)
+        else:
+            print("注: FFXI USER フォルダが見つからず、バックアップをスキップしました。")
+            self.statusBar().clearMessage()
+        # data/edit のキャラクター構成が変わった場合のみ一覧を更新
+        current = [self.character_combo.itemData(i) for i in range(self.character_combo.count())]
+        try:
+            latest = [cid for cid, _ in storage.list_characters("local")]
+        except Exception:
+            latest = current
+        if latest != current:
+            self.refresh_characters()
+
+    def _on_backup_failed(self, message: str) -> None:
+        print(f"Backup failed: {message}")
+        self.statusBar().showMessage(get_text("status_backup_failed").format(error=message), 5000)
+
+    def _on_backup_finished(self) -> None:
+        if self._backup_worker is not None:
+            self._backup_worker.deleteLater()
+        self._backup_worker = None
+        self._set_backup_gated_enabled(True)
+
+    # ====== 検索インデックス ======
+    def _start_repo_indexing(self) -> None:
+        """Index the current repository in the background so the first search and completion do not stall."""
+        repo = self.repo
+        if repo is None:
+            return
+        search = not repo.has_search_index and not repo.search_index_building
+        usage = (
+            UsageTracker is not None
+            and repo not in self._usage_trackers
+            and repo not in self._usage_pending
+        )
+        if not search and not usage:
+            return
+        if usage:
+            self._usage_pending[repo] = set()
+            repo.add_macro_listener(lambda address, repo=repo: self._on_repo_macro_changed(repo, address))
+        worker = RepositoryIndexWorker(repo, search, usage, self)
+        worker.built.connect(self._on_repo_index_built)
+        worker.finished.connect(lambda w=worker: self._on_repo_index_finished(w))
+        self._index_workers.append(worker)
+        worker.start()
+
+    def _on_repo_index_built(self, repo, index, tracker) -> None:
+        if index is not None:
+            repo.install_search_index(index)
+            if self._search_dialog is not None and repo is self.repo:
+                self._search_dialog.on_index_ready()
+        if tracker is not None:
+            # 集計中に編集されたマクロだけ数え直す
+            for address in self._usage_pending.pop(repo, ()):
+                macro = repo.books[address[0]].sets[address[1]].get(address[2], address[3])
+                tracker.update(address, macro.lines)
+            self._usage_trackers[repo] = tracker
+            if repo is self.repo:
+                set_completion_usage(tracker.counts)
+
+    def _on_repo_index_finished(self, worker: RepositoryIndexWorker) -> None:
+        if worker in self._index_workers:
+            self._index_workers.remove(worker)
+        worker.deleteLater()
+
+    def _save_import_checkpoint(self) -> None:
+        # 取り込みは1回の取り消し操作で戻せるため、全ファイルのエクスポートではなく
+        # 取り込み直前のJSONを1ファイルだけ退避しておく（アプリ終了後の保険）
+        self.repo.save()
+        try:
+            self.repo.save_checkpoint("pre_import")
+        except Exception as e:
+            print(f"Checkpoint save failed: {e}")
+
+    def _format_merge_conflicts(self, conflicts, limit: int = 10) -> str:
+        rows = []
+        for conflict in conflicts[:limit]:
+            path = conflict.path
+            if path[0] == "macro":
+                _, book_idx, set_idx, side, macro_idx = path
+                rows.append(
+                    f"Book{book_idx + 1} Set{set_idx + 1} {side.capitalize()}{macro_idx + 1}: "
+                    f"{conflict.local.name or '-'} / {conflict.remote.name or '-'}"
+                )
+            else:
+                rows.append(f"Book{path[1] + 1}: {conflict.local or '-'} / {conflict.remote or '-'}")
+        if len(conflicts) > limit:
+            rows.append("...")
+        return "\n".join(rows)
+
     def on_ffxi_import(self):
+        if self._backup_running():
+            QMessageBox.information(self, get_text("dlg_ffxi_import_title"), get_text("msg_backup_in_progress"))
+            return
         if not self._check_unsaved_changes():
             return
         try:
@@ -1856,52 +2655,74 @@ class VanaMacroUI(QMainWindow):
                 QMessageBox.information(self, get_text("dlg_ffxi_import_title"), get_text("msg_ffxi_mcr_not_loaded"))
                 return
 
-            # 警告と確認
-            ret = QMessageBox.warning(
-                self,
-                get_text("dlg_ffxi_import"),
-                get_text("msg_ffxi_import_confirm"),
-                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
-                QMessageBox.StandardButton.No
-            )
-            if ret != QMessageBox.StandardButton.Yes:
-                return
-
-            # ユーザーの要望: 内部的にマクロ保存 -> エクスポート(バックアップ) -> 取り込み
             # 現在編集中のマクロをメモリに保存
             self._save_current_macro_to_memory()
-            # リポジトリをディスクに保存（エクスポート機能が最新のJSONを参照できるようにするため）
-            if self.repo:
-                self.repo.save()
-
-            # バックアップ作成 (エクスポート機能を利用してスナップショットを保存)
             if not self.repo:
-                self.repo = MacroRepository.load_or_create(character_id=str(cid))
-            
-            try:
-                if exporter:
-                    # 現在の状態をエクスポートフォルダに保存（JSONも含まれる）
-                    exporter.export_character_macros(
-                        character_id=str(cid),
-                        destination=None, # デフォルトのエクスポート先を使用
-                        include_snapshot=True,
-                        verify=False # バックアップなので検証はスキップ
-                    )
-            except Exception as e:
-                print(f"Backup export failed: {e}")
-                # エクスポート失敗しても取り込みは続行するが、ログには残す
+                self.repo = repository_cache.get(str(cid), resolve_stale=self._resolve_stale_repo)
 
             snap = ffxi_mcr.import_ffxi_macros(char_dir)
             if not snap:
                 QMessageBox.information(self, get_text("dlg_ffxi_import_title"), get_text("msg_ffxi_mcr_not_found"))
                 return
-            if not self.repo:
-                self.repo = MacroRepository.load_or_create(character_id=str(cid))
-            self.repo.apply_external_snapshot(snap, save=True)
+
+            base = self.repo.load_import_base() if macro_merge is not None else None
+            if base is None:
+                # 前回の取り込み状態が無い場合は従来通り全体を上書き
+                ret = QMessageBox.warning(
+                    self,
+                    get_text("dlg_ffxi_import"),
+                    get_text("msg_ffxi_import_confirm"),
+                    QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                    QMessageBox.StandardButton.No
+                )
+                if ret != QMessageBox.StandardButton.Yes:
+                    return
+                self._save_import_checkpoint()
+                self.repo.apply_external_snapshot(snap, save=True)
+            else:
+                # 前回取り込み時の状態を基準に、ゲーム側とローカル側の変更をセット単位で3-wayマージ
+                result = macro_merge.merge_three_way(
+                    MacroHashTree(base), self.repo.hash_tree, MacroHashTree.from_payload(snap)
+                )
+                if result.is_noop:
+                    self.repo.save_import_base(snap)
+                    QMessageBox.information(self, get_text("dlg_ffxi_import_title"), get_text("msg_ffxi_merge_up_to_date"))
+                    return
+                prefer = "local"
+                if result.conflicts:
+                    ret = QMessageBox.question(
+                        self,
+                        get_text("dlg_ffxi_import"),
+                        get_text("msg_ffxi_merge_conflicts").format(
+                            changes=len(result.remote_changes),
+                            conflicts=len(result.conflicts),
+                            details=self._format_merge_conflicts(result.conflicts),
+                        ),
+                        QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No | QMessageBox.StandardButton.Cancel,
+                        QMessageBox.StandardButton.Cancel,
+                    )
+                    if ret == QMessageBox.StandardButton.Cancel:
+                        return
+                    if ret == QMessageBox.StandardButton.Yes:
+                        prefer = "remote"
+                else:
+                    ret = QMessageBox.question(
+                        self,
+                        get_text("dlg_ffxi_import"),
+                        get_text("msg_ffxi_merge_confirm").format(changes=len(result.remote_changes)),
+                        QMessageBox.StandardButton.Ok | QMessageBox.StandardButton.Cancel,
+                        QMessageBox.StandardButton.Ok,
+                    )
+                    if ret != QMessageBox.StandardButton.Ok:
+                        return
+                self._save_import_checkpoint()
+                self.repo.apply_changes(result.changes(prefer), "import", save=True)
+            self.repo.save_import_base(snap)
             self.refresh_books()
             self._refresh_set_button_labels()
             self._refresh_macro_button_labels()
             self._reload_current_macro_into_editor()
+            self._refresh_completion_usage()
             QMessageBox.information(self, get_text("dlg_complete"), get_text("msg_ffxi_import_complete"))
         except Exception as e:
             QMessageBox.warning(self, get_text("dlg_ffxi_import_error"), str(e))
@@ -1,16 +1,34 @@
 from PyQt6.QtWidgets import QTextEdit, QCompleter
-from PyQt6.QtCore import Qt, QRegularExpression
+from PyQt6.QtCore import Qt, QRegularExpression, QObject, QStringListModel, pyqtSignal
 from PyQt6.QtGui import (
-    QSyntaxHighlighter, QTextCharFormat, QColor, QFont, QKeyEvent, QTextCursor, QAction
+    QSyntaxHighlighter, QTextCharFormat, QColor, QFont, QKeyEvent, QTextCursor, QAction,
+    QTextBlockUserData
 )
-from pathlib import Path
+from bisect import bisect_left, bisect_right
 import logging
 import re
-import sqlite3
+
+from macro_completion import (
+    KIND_JA, KIND_MAGIC, KIND_PET, KIND_WS, NAME_KINDS,
+    CompletionIndex, find_context,
+)
+from resource_registry import EditorResources, ResourceRegistry
 
 # Module-level logger for optional debug output.
 logger = logging.getLogger(__name__)
 
+# 行の長さチェックは書き出し時と同じエンコード結果（定型文は6バイト）で測る
+try:
+    from ffxi_autotrans import encode_macro_text as _encode_line
+except Exception:
+    def _encode_line(text: str) -> bytes:
+        return text.encode("cp932", errors="ignore")
+
+try:
+    from ffxi_mcr_writer import LINE_DATA_BYTES
+except Exception:
+    LINE_DATA_BYTES = 60
+
 # FFXI マクロのコマンドリスト（優先度順）
 # 頻繁に使用するコマンドを上位に配置
 _PRIORITY_COMMANDS = [
@@ -48,27 +66,42 @@ _PRIORITY_COMMANDS = [
     "/map", "/clock", "/names"
 ]
 
-def _load_autotrans_commands():
-    """resources.dbからコマンドを読み込む"""
-    db_path = Path(__file__).resolve().parent / "autotrans_data" / "resources.db"
-    if not db_path.exists():
-        return set()
-    
-    try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT command FROM commands")
-        commands = {row[0] for row in cursor.fetchall()}
-        conn.close()
-        return commands
-    except Exception:
-        return set()
-
-# 優先度順にコマンドリストを構築
-_autotrans_commands = _load_autotrans_commands()
-_all_commands = set(_PRIORITY_COMMANDS) | _autotrans_commands
-# 優先コマンドを先頭に、その他は後ろに追加（重複を除外）
-COMMANDS = _PRIORITY_COMMANDS + [cmd for cmd in sorted(_autotrans_commands) if cmd not in _PRIORITY_COMMANDS]
+# DB由来のコマンドはリソース読み込み後に _install_resources で追加する
+COMMANDS = list(_PRIORITY_COMMANDS)
+
+
+def _trie_pattern(words) -> str:
+    """Build a regex alternation shaped like a trie; at each branch longer continuations are tried first."""
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def render(node: dict) -> str:
+        terminal = "" in node
+        branches = [re.escape(ch) + render(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if terminal:
+            # ここで終わる語もあるので、続きは省略可能（貪欲なので長い一致を優先）
+            return "(?:" + body + ")?"
+        return body
+
+    return render(trie)
+
+
+def _compile_command_pattern(commands):
+    """One regex for every command; boundaries are line start/end, whitespace, '<' and '>'."""
+    words = {cmd.lower() for cmd in commands if cmd}
+    if not words:
+        return None
+    return re.compile(r"(?<![^ \t<>])" + _trie_pattern(words) + r"(?![^ \t<>])")
+
+
+_COMMAND_PATTERN = _compile_command_pattern(COMMANDS)
 
 # ターゲット代名詞リスト（使用頻度順）
 TARGETS = [
@@ -84,40 +117,6 @@ TARGETS = [
     "<stnpc>",  # サブターゲットNPC
     "<a10>", "<a11>", "<a12>", "<a20>", "<a21>", "<a22>"  # アライアンス
 ]
-def _load_resource_names_from_db(resource_type, locale=None):
-    """resources.dbからリソース名を読み込む"""
-    db_path = Path(__file__).resolve().parent / "autotrans_data" / "resources.db"
-    if not db_path.exists():
-        return set()
-    
-    try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        if locale:
-            cursor.execute(
-                "SELECT name FROM resource_names WHERE type = ? AND locale = ?",
-                (resource_type, locale)
-            )
-        else:
-            cursor.execute(
-                "SELECT name FROM resource_names WHERE type = ?",
-                (resource_type,)
-            )
-        names = {row[0] for row in cursor.fetchall()}
-        conn.close()
-        return names
-    except Exception:
-        return set()
-
-
-def _safe_names_from_db(resource_type, locale=None):
-    """resources.dbからリソース名を安全に読み込む（エラー時は空セットを返す）"""
-    try:
-        return _load_resource_names_from_db(resource_type, locale)
-    except Exception:
-        return set()
-
-
 def _split_locale_lists(names):
     en: list[str] = []
     ja: list[str] = []
@@ -134,33 +133,236 @@ def _split_locale_lists(names):
     return en, ja
 
 
-JOB_ABILITY_EN, JOB_ABILITY_JA = _split_locale_lists(
-    _safe_names_from_db("JobAbility")
-)
-
+# 名前リストはリソース読み込み後に _install_resources で差し替える
+JOB_ABILITY_EN: list[str] = []
+JOB_ABILITY_JA: list[str] = []
 # 条件付きJA（Scholar, CorsairRoll, CorsairShot, Samba, Waltz, Jig, Step, Flourish1~3など）
-CONDITIONAL_JA_EN, CONDITIONAL_JA_JA = _split_locale_lists(
-    _safe_names_from_db("ConditionalJA")
-)
-
+CONDITIONAL_JA_EN: list[str] = []
+CONDITIONAL_JA_JA: list[str] = []
 # ペットコマンド（獣使い・召喚士・からくり士・竜騎士）
-PET_COMMAND_EN, PET_COMMAND_JA = _split_locale_lists(
-    _safe_names_from_db("PetCommand")
-)
-
-WEAPON_SKILL_EN, WEAPON_SKILL_JA = _split_locale_lists(
-    _safe_names_from_db("WeaponSkill")
-)
-
+PET_COMMAND_EN: list[str] = []
+PET_COMMAND_JA: list[str] = []
+WEAPON_SKILL_EN: list[str] = []
+WEAPON_SKILL_JA: list[str] = []
 # 魔法（spells.luaから抽出したもの + 定型文の「ウタ」カテゴリ）
-_all_magic_names = _safe_names_from_db("Magic")
+MAGIC_EN: list[str] = []
+MAGIC_JA: list[str] = []
 
 # 敵専用魔法を除外（プレイヤーが使えない魔法）
 # 「カーズ」(Curse) や「ウィルス」(Virus) など
-_enemy_only_spells = {"Curse", "カーズ", "Virus", "ウィルス"}
-_all_magic_names = _all_magic_names - _enemy_only_spells
+_ENEMY_ONLY_SPELLS = {"Curse", "カーズ", "Virus", "ウィルス"}
+
+
+class _NameAutomaton:
+    """Aho–Corasick automaton over many names, each carrying a sortable priority key.
+
+    ``iter_matches`` yields every ``(start, end, key)`` occurrence in one pass
+    over the text. When the same string is registered more than once, only
+    the smallest key is kept.
+    """
+
+    def __init__(self, patterns) -> None:
+        best: dict[str, tuple] = {}
+        for word, key in patterns:
+            if word and (word not in best or key < best[word]):
+                best[word] = key
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[list[tuple[int, tuple]]] = [[]]
+        for word, key in best.items():
+            node = 0
+            for ch in word:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append((len(word), key))
+
+        # 失敗リンクを幅優先で張り、出力を失敗先から継承する
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def iter_matches(self, text: str):
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        node = 0
+        for pos, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                end = pos + 1
+                for length, key in out[node]:
+                    yield end - length, end, key
+
+
+_NAME_EN, _NAME_JA = 0, 1
+
+
+def _build_name_automata(categories):
+    """Compile every category name list into one EN and one JA automaton.
+
+    Keys are ``(category, language, rank, variant)``: sorting matches by key
+    and start reproduces the old per-list scanning order (longer names first,
+    a Japanese name's exact form before its base name).
+    """
+    en_patterns = []
+    ja_patterns = []
+    for category, (en_list, ja_list) in enumerate(categories):
+        for rank, name in enumerate(en_list):
+            en_patterns.append((name, (category, _NAME_EN, rank, 0)))
+        for rank, name in enumerate(ja_list):
+            ja_patterns.append((name, (category, _NAME_JA, rank, 0)))
+            # ベース名の部分一致（「:」や「・」の前まで、3文字以上）
+            base_name = name.split(':')[0].split('・')[0].strip()
+            if len(base_name) >= 3 and base_name != name:
+                ja_patterns.append((base_name, (category, _NAME_JA, rank, 1)))
+    return _NameAutomaton(en_patterns), _NameAutomaton(ja_patterns)
+
+
+_EN_NAME_AUTOMATON, _JA_NAME_AUTOMATON = _build_name_automata(())
+# 名前が読み込まれるまではコマンドとターゲットだけを補完する
+_COMPLETION_INDEX = CompletionIndex(COMMANDS, TARGETS)
+# 読み込み中のマクロから集計した使用回数（補完候補の並び順に使う）
+_completion_usage: dict = {}
+
+
+def _prepare_resources(resources: EditorResources) -> dict:
+    """Build every derived list, pattern and automaton (runs on the loader thread)."""
+    db_commands = set(resources.commands)
+    commands = _PRIORITY_COMMANDS + [cmd for cmd in sorted(db_commands) if cmd not in _PRIORITY_COMMANDS]
+    job_en, job_ja = _split_locale_lists(set(resources.names_of("JobAbility")))
+    cond_en, cond_ja = _split_locale_lists(set(resources.names_of("ConditionalJA")))
+    pet_en, pet_ja = _split_locale_lists(set(resources.names_of("PetCommand")))
+    ws_en, ws_ja = _split_locale_lists(set(resources.names_of("WeaponSkill")))
+    magic_en, magic_ja = _split_locale_lists(set(resources.names_of("Magic")) - _ENEMY_ONLY_SPELLS)
+    # カテゴリ別ハイライトの優先順位：JA > Magic > WS > Conditional JA > Pet Command
+    # Magic を Conditional JA より前に置くことで、「ブレイク」が「レイク」より優先される
+    en_automaton, ja_automaton = _build_name_automata((
+        (job_en, job_ja),
+        (magic_en, magic_ja),
+        (ws_en, ws_ja),
+        (cond_en, cond_ja),
+        (pet_en, pet_ja),
+    ))
+    return {
+        "COMMANDS": commands,
+        "_COMMAND_PATTERN": _compile_command_pattern(commands),
+        "JOB_ABILITY_EN": job_en, "JOB_ABILITY_JA": job_ja,
+        "CONDITIONAL_JA_EN": cond_en, "CONDITIONAL_JA_JA": cond_ja,
+        "PET_COMMAND_EN": pet_en, "PET_COMMAND_JA": pet_ja,
+        "WEAPON_SKILL_EN": ws_en, "WEAPON_SKILL_JA": ws_ja,
+        "MAGIC_EN": magic_en, "MAGIC_JA": magic_ja,
+        "_EN_NAME_AUTOMATON": en_automaton,
+        "_JA_NAME_AUTOMATON": ja_automaton,
+        # 補完候補は元の表記（大文字小文字）のまま、両言語とも登録する
+        "_COMPLETION_INDEX": CompletionIndex(commands, TARGETS, {
+            KIND_MAGIC: sorted(set(resources.names_of("Magic")) - _ENEMY_ONLY_SPELLS),
+            KIND_JA: sorted(set(resources.names_of("JobAbility")) | set(resources.names_of("ConditionalJA"))),
+            KIND_WS: sorted(set(resources.names_of("WeaponSkill"))),
+            KIND_PET: sorted(set(resources.names_of("PetCommand"))),
+        }),
+    }
+
+
+class _ResourceNotifier(QObject):
+    # 読み込みスレッドから送られ、メインスレッドで受け取る
+    loaded = pyqtSignal(object)
+    # モジュールのリストを差し替えた後に送る（ハイライト・補完の更新用）
+    resources_ready = pyqtSignal()
+
+
+_resource_registry = ResourceRegistry(_prepare_resources)
+_resource_notifier = _ResourceNotifier()
+_resources_installed = False
+
+
+def _install_resources(prepared: dict) -> None:
+    global _resources_installed
+    if _resources_installed:
+        return
+    globals().update(prepared)
+    _COMPLETION_INDEX.set_usage(_completion_usage)
+    _resources_installed = True
+    _resource_notifier.resources_ready.emit()
+
+
+_resource_notifier.loaded.connect(_install_resources)
+
+
+def ensure_editor_resources(block: bool = False) -> bool:
+    """Start loading the editor resources; with ``block`` wait and install them now.
+
+    Returns True once the lists are installed. Call from the GUI thread.
+    """
+    if _resources_installed:
+        return True
+    if block:
+        _install_resources(_resource_registry.get())
+        return True
+    _resource_registry.start()
+    return False
+
+
+_resource_registry.add_listener(_resource_notifier.loaded.emit)
+
+
+def set_completion_usage(usage: dict) -> None:
+    """Rank completions by ``usage`` (``kind -> Counter``, e.g. a repository's ``UsageTracker.counts``)."""
+    global _completion_usage
+    _completion_usage = usage
+    _COMPLETION_INDEX.set_usage(_completion_usage)
+
+
+def completion_usage_changed() -> None:
+    """Call after the counts given to ``set_completion_usage`` were updated in place."""
+    _COMPLETION_INDEX.usage_changed()
+
+
+class _HighlightedRanges:
+    """Sorted, disjoint half-open column intervals that are already formatted in a block."""
+
+    __slots__ = ("_starts", "_ends")
+
+    def __init__(self) -> None:
+        self._starts: list[int] = []
+        self._ends: list[int] = []
+
+    def overlaps(self, start: int, end: int) -> bool:
+        if start >= end:
+            return False
+        # start より後ろで終わる最初の区間が end より前で始まっていれば重なる
+        i = bisect_right(self._ends, start)
+        return i < len(self._starts) and self._starts[i] < end
+
+    def add(self, start: int, end: int) -> None:
+        if start >= end:
+            return
+        # 接する・重なる区間をまとめて1つに置き換える
+        i = bisect_left(self._ends, start)
+        j = bisect_right(self._starts, end)
+        if i < j:
+            start = min(start, self._starts[i])
+            end = max(end, self._ends[j - 1])
+        self._starts[i:j] = [start]
+        self._ends[i:j] = [end]
 
-MAGIC_EN, MAGIC_JA = _split_locale_lists(_all_magic_names)
 
 class MacroSyntaxHighlighter(QSyntaxHighlighter):
     def __init__(self, parent=None):
@@ -168,7 +370,7 @@ class MacroSyntaxHighlighter(QSyntaxHighlighter):
         self.rules = []
 
         # 1. コマンド (/ma, /ws など) - 青色太字
-        # 注意: 正規表現パターンは使用せず、highlightBlockで実際のコマンドリストと照合
+        # COMMANDS からトライ状に組んだ1本の正規表現 (_COMMAND_PATTERN) で highlightBlock 内で照合
         self.cmd_format = QTextCharFormat()
         self.cmd_format.setForeground(QColor("#4488ff"))
 
@@ -220,9 +422,13 @@ class MacroSyntaxHighlighter(QSyntaxHighlighter):
         self.error_format.setUnderlineStyle(QTextCharFormat.UnderlineStyle.WaveUnderline)
         self.error_format.setUnderlineColor(QColor("red"))
 
+        # 名前リストは別スレッドで読み込み、揃ったら全体を再ハイライトする
+        _resource_notifier.resources_ready.connect(self.rehighlight)
+        ensure_editor_resources()
+
     def highlightBlock(self, text):
         # 既にハイライトされた範囲を追跡（重複を避けるため）
-        self.highlighted_ranges = set()
+        self.highlighted_ranges = _HighlightedRanges()
         
         # 引用符の位置を記録（カテゴリハイライト時に使用）
         self.quote_ranges = []
@@ -246,22 +452,14 @@ class MacroSyntaxHighlighter(QSyntaxHighlighter):
                 length = match.capturedLength()
                 self.setFormat(start, length, fmt)
                 # ハイライトされた範囲を記録
-                for i in range(start, start + length):
-                    self.highlighted_ranges.add(i)
+                self.highlighted_ranges.add(start, start + length)
 
         # コマンドハイライト（定義されたコマンドリストに基づく）
         self._highlight_commands(text)
 
         # カテゴリ別ハイライト（単独ワードでも適用）
-        # 優先順位：JA > Magic > WS > Conditional JA > Pet Command
-        # 長い名前から先に処理されるため、部分一致を防げる
-        # Magic を Conditional JA より前に処理することで、「ブレイク」が「レイク」より優先される
-        lower = text.lower()
-        self._highlight_name_set(text, lower, JOB_ABILITY_EN, JOB_ABILITY_JA, self.job_format)
-        self._highlight_name_set(text, lower, MAGIC_EN, MAGIC_JA, self.magic_format)
-        self._highlight_name_set(text, lower, WEAPON_SKILL_EN, WEAPON_SKILL_JA, self.ws_format)
-        self._highlight_name_set(text, lower, CONDITIONAL_JA_EN, CONDITIONAL_JA_JA, self.conditional_ja_format)
-        self._highlight_name_set(text, lower, PET_COMMAND_EN, PET_COMMAND_JA, self.pet_command_format)
+        # 全カテゴリの名前を1回の走査で拾い、優先順位順に適用する
+        self._highlight_names(text)
 
         # エラー検出: Shift-JIS換算で60バイトを超える場合
         # ここでのハイライトは行わない（QTextEditのExtraSelectionsで処理する）
@@ -269,94 +467,43 @@ class MacroSyntaxHighlighter(QSyntaxHighlighter):
 
     def _highlight_commands(self, text):
         """定義されたコマンドリストに基づいてコマンドをハイライト"""
-        lower = text.lower()
-        for cmd in COMMANDS:
-            cmd_lower = cmd.lower()
-            start = 0
-            while True:
-                idx = lower.find(cmd_lower, start)
-                if idx == -1:
-                    break
-                end = idx + len(cmd)
-                # コマンドの前後が適切な区切り文字であることを確認
-                # 空白、タブ、行頭/行末、定型文括弧 << >> を境界として認識
-                before_ok = (idx == 0) or (text[idx - 1] in ' \t<>')
-                after_ok = (end >= len(text)) or (text[end] in ' \t<>')
-                # 既にハイライトされていない範囲のみ適用
-                if before_ok and after_ok and not self._is_range_highlighted(idx, end):
-                    self.setFormat(idx, len(cmd), self.cmd_format)
-                    for i in range(idx, end):
-                        self.highlighted_ranges.add(i)
-                start = idx + len(cmd)
-
-    def _highlight_name_set(self, text, lower_text, en_list, ja_list, fmt):
-        if not fmt:
+        if _COMMAND_PATTERN is None:
             return
-        if en_list:
-            self._highlight_english_names(text, lower_text, en_list, fmt)
-        if ja_list:
-            self._highlight_japanese_names(text, ja_list, fmt)
-
-    def _highlight_english_names(self, text, lower_text, names, fmt):
-        for name in names:
-            start = 0
-            while True:
-                idx = lower_text.find(name, start)
-                if idx == -1:
-                    break
-                end = idx + len(name)
-                # 既にハイライトされていない、かつ単語境界が正しい場合のみ適用
-                if self._is_ascii_word_boundary(text, idx, end) and not self._is_range_highlighted(idx, end):
-                    self.setFormat(idx, len(name), fmt)
-                    for i in range(idx, end):
-                        self.highlighted_ranges.add(i)
-                start = idx + len(name)
-
-    def _highlight_japanese_names(self, text, names, fmt):
-        # 日本語名は部分一致も許可（例：「空蝉の術」は「空蝉の術:壱」を含む）
-        for name in names:
-            # 完全一致
-            start = 0
-            while True:
-                idx = text.find(name, start)
-                if idx == -1:
-                    break
-                end = idx + len(name)
-                # 単語境界チェック: 前後に日本語・英数字が続いていないかチェック
-                before_ok = (idx == 0) or not self._is_word_char(text[idx - 1])
-                after_ok = (end >= len(text)) or not self._is_word_char(text[end])
-                # 既にハイライトされていない、かつ境界が正しい場合のみ適用
-                if before_ok and after_ok and not self._is_range_highlighted(idx, end):
-                    self.setFormat(idx, len(name), fmt)
-                    for i in range(idx, end):
-                        self.highlighted_ranges.add(i)
-                start = idx + 1  # 1文字進めて次の候補を探す
-            
-            # ベース名の部分一致（「:」や「・」の前まで）
-            base_name = name.split(':')[0].split('・')[0].strip()
-            if len(base_name) >= 3 and base_name != name:  # 3文字以上で元の名前と異なる場合
-                start = 0
-                while True:
-                    idx = text.find(base_name, start)
-                    if idx == -1:
-                        break
-                    end = idx + len(base_name)
-                    # 単語境界チェック
-                    before_ok = (idx == 0) or not self._is_word_char(text[idx - 1])
-                    after_ok = (end >= len(text)) or not self._is_word_char(text[end])
-                    # 既にハイライトされていない、かつ境界が正しい場合のみ適用
-                    if before_ok and after_ok and not self._is_range_highlighted(idx, end):
-                        self.setFormat(idx, len(base_name), fmt)
-                        for i in range(idx, end):
-                            self.highlighted_ranges.add(i)
-                    start = idx + 1
+        # コマンドの前後は空白、タブ、行頭/行末、定型文括弧 << >> のみ許可（正規表現側で判定）
+        for match in _COMMAND_PATTERN.finditer(text.lower()):
+            idx, end = match.span()
+            # 既にハイライトされていない範囲のみ適用
+            if not self._is_range_highlighted(idx, end):
+                self.setFormat(idx, end - idx, self.cmd_format)
+                self.highlighted_ranges.add(idx, end)
+
+    def _highlight_names(self, text):
+        category_formats = (
+            self.job_format,
+            self.magic_format,
+            self.ws_format,
+            self.conditional_ja_format,
+            self.pet_command_format,
+        )
+        matches = list(_EN_NAME_AUTOMATON.iter_matches(text.lower()))
+        matches.extend(_JA_NAME_AUTOMATON.iter_matches(text))
+        matches.sort(key=lambda m: (m[2], m[0]))
+        for start, end, key in matches:
+            if key[1] == _NAME_EN:
+                ok = self._is_ascii_word_boundary(text, start, end)
+            else:
+                # 日本語名は前後に日本語・英数字が続いていないかチェック
+                ok = ((start == 0) or not self._is_word_char(text[start - 1])) and (
+                    (end >= len(text)) or not self._is_word_char(text[end])
+                )
+            # 既にハイライトされていない、かつ境界が正しい場合のみ適用
+            if ok and not self._is_range_highlighted(start, end):
+                self.setFormat(start, end - start, category_formats[key[0]])
+                self.highlighted_ranges.add(start, end)
 
     def _is_range_highlighted(self, start, end):
         """指定された範囲が既にハイライトされているかチェック"""
-        for i in range(start, end):
-            if i in self.highlighted_ranges:
-                return True
-        return False
+        return self.highlighted_ranges.overlaps(start, end)
 
     @staticmethod
     def _is_ascii_word_boundary(text, start, end):
@@ -384,20 +531,45 @@ class MacroSyntaxHighlighter(QSyntaxHighlighter):
         return ch.isalnum() or ch == "_" or ch.isalpha()
 
 
+def _line_has_error(text: str) -> bool:
+    """True if the line cannot be written as-is: non-cp932 characters or too many encoded bytes."""
+    try:
+        # FFXIはShift-JIS (cp932)。書き出し時は黙って落とされるので警告する
+        text.encode("cp932")
+    except UnicodeEncodeError:
+        return True
+    return len(_encode_line(text)) > LINE_DATA_BYTES
+
+
+class _LineCheckData(QTextBlockUserData):
+    """Cached validation result of a block, valid while the block revision is unchanged."""
+
+    def __init__(self, revision: int, has_error: bool) -> None:
+        super().__init__()
+        self.revision = revision
+        self.has_error = has_error
+
+
 class MacroEditor(QTextEdit):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.highlighter = MacroSyntaxHighlighter(self.document())
         
         # 入力補完の設定
-        self.completer = QCompleter(COMMANDS + TARGETS, self)
+        # 候補の絞り込みと並べ替えは _COMPLETION_INDEX が行うので、QCompleter では絞り込まない
+        self._completion_model = QStringListModel(self)
+        self._completion_context = None
+        self.completer = QCompleter(self._completion_model, self)
         self.completer.setWidget(self)
-        self.completer.setCompletionMode(QCompleter.CompletionMode.PopupCompletion)
-        self.completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        self.completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
         self.completer.activated.connect(self.insert_completion)
         
         # 全角スペース自動変換用のフラグ
         self._converting_space = False
+        # 直近の編集で変更された範囲 [start, end)（全角スペース変換の対象）
+        self._space_dirty: tuple[int, int] | None = None
+        self._error_key: tuple | None = None
+        self.document().contentsChange.connect(self._on_contents_change)
         self.textChanged.connect(self._convert_fullwidth_spaces)
         self.textChanged.connect(self._check_line_errors)
         
@@ -405,73 +577,106 @@ class MacroEditor(QTextEdit):
         self._check_line_errors()
 
     def insert_completion(self, completion):
+        context = self._completion_context
+        if context is None:
+            return
+        self._completion_context = None
         tc = self.textCursor()
-        extra = len(completion) - len(self.completer.completionPrefix())
-        tc.movePosition(QTextCursor.MoveOperation.Left)
-        tc.movePosition(QTextCursor.MoveOperation.EndOfWord)
-        tc.insertText(completion[-extra:])
+        text = completion
+        if context.kind in NAME_KINDS:
+            if context.quoted:
+                # 閉じ引用符がまだ無ければ補う
+                if self.document().characterAt(tc.position()) != '"':
+                    text += '"'
+            elif " " in completion:
+                text = f'"{completion}"'
+        # 入力途中の部分（引用符の後ろから）を候補で置き換える
+        tc.setPosition(tc.block().position() + context.start, QTextCursor.MoveMode.KeepAnchor)
+        tc.insertText(text)
         self.setTextCursor(tc)
-
-    def textUnderCursor(self):
-        tc = self.textCursor()
-        tc.select(QTextCursor.SelectionType.WordUnderCursor)
-        return tc.selectedText()
+        _COMPLETION_INDEX.record_use(context.kind, completion)
 
     def _check_line_errors(self):
-        """各行の長さをチェックし、エラーがあればExtraSelectionで警告を表示"""
-        selections = []
+        """各行の長さをチェックし、エラーがあればExtraSelectionで警告を表示
+
+        判定結果はブロックのリビジョンごとにキャッシュし、変更された行だけを再エンコードする。
+        """
         doc = self.document()
-        
+        error_blocks = []
+        block = doc.begin()
+        while block.isValid():
+            data = block.userData()
+            if not isinstance(data, _LineCheckData) or data.revision != block.revision():
+                data = _LineCheckData(block.revision(), _line_has_error(block.text()))
+                block.setUserData(data)
+            if data.has_error:
+                error_blocks.append(block)
+            block = block.next()
+
+        # エラー行の位置・内容が変わっていなければ ExtraSelection を作り直さない
+        key = tuple((b.position(), b.length(), b.revision()) for b in error_blocks)
+        if key == self._error_key:
+            return
+        self._error_key = key
+
         # エラー警告用のフォーマット
         error_format = QTextCharFormat()
         error_format.setUnderlineStyle(QTextCharFormat.UnderlineStyle.WaveUnderline)
         error_format.setUnderlineColor(QColor("red"))
         # 背景色や文字色は変更しない（シンタックスハイライトを維持するため）
-        
-        for i in range(doc.blockCount()):
-            block = doc.findBlockByNumber(i)
-            text = block.text()
-            
-            has_error = False
-            try:
-                # FFXIはShift-JIS (cp932)
-                encoded = text.encode("cp932")
-                if len(encoded) > 60:
-                    has_error = True
-            except UnicodeEncodeError:
-                has_error = True
-            
-            if has_error:
-                selection = QTextEdit.ExtraSelection()
-                selection.format = error_format
-                # 行全体を選択
-                selection.cursor = QTextCursor(doc)
-                selection.cursor.setPosition(block.position())
-                selection.cursor.movePosition(QTextCursor.MoveOperation.EndOfBlock, QTextCursor.MoveMode.KeepAnchor)
-                # 行全体に設定（空行の場合は幅ゼロになるが、エラー行は文字があるはず）
-                selections.append(selection)
-        
+
+        selections = []
+        for block in error_blocks:
+            selection = QTextEdit.ExtraSelection()
+            selection.format = error_format
+            # 行全体を選択
+            selection.cursor = QTextCursor(doc)
+            selection.cursor.setPosition(block.position())
+            selection.cursor.movePosition(QTextCursor.MoveOperation.EndOfBlock, QTextCursor.MoveMode.KeepAnchor)
+            selections.append(selection)
+
         self.setExtraSelections(selections)
 
+    def _on_contents_change(self, position: int, removed: int, added: int):
+        if removed > 0:
+            # 置き換えられた範囲の ExtraSelection のカーソルは潰れるので、次のチェックで作り直す
+            self._error_key = None
+        if self._converting_space or added <= 0:
+            return
+        start, end = position, position + added
+        if self._space_dirty is not None:
+            start = min(start, self._space_dirty[0])
+            end = max(end, self._space_dirty[1])
+        self._space_dirty = (start, end)
+
     def _convert_fullwidth_spaces(self):
-        """テキスト変更時に全角スペースを半角に自動変換"""
-        if self._converting_space:
+        """テキスト変更時に全角スペースを半角に自動変換
+
+        変更された範囲だけを調べ、見つかった文字だけを QTextCursor で置き換える。
+        直前の入力と同じ編集ブロックにまとめるので、元に戻す操作も1回で済む。
+        """
+        if self._converting_space or self._space_dirty is None:
             return
-        
-        text = self.toPlainText()
-        if '　' in text:
-            self._converting_space = True
-            cursor = self.textCursor()
-            position = cursor.position()
-            
-            # 全角スペースを半角に置換
-            new_text = text.replace('　', ' ')
-            self.setPlainText(new_text)
-            
-            # カーソル位置を復元
-            cursor.setPosition(min(position, len(new_text)))
-            self.setTextCursor(cursor)
-            
+        start, end = self._space_dirty
+        self._space_dirty = None
+
+        doc = self.document()
+        end = min(end, doc.characterCount() - 1)
+        positions = [pos for pos in range(start, end) if doc.characterAt(pos) == '　']
+        if not positions:
+            return
+
+        self._converting_space = True
+        try:
+            cursor = QTextCursor(doc)
+            cursor.joinPreviousEditBlock()
+            for pos in positions:
+                # 1文字を1文字で置き換えるので、以降の位置やカーソル位置はずれない
+                cursor.setPosition(pos)
+                cursor.setPosition(pos + 1, QTextCursor.MoveMode.KeepAnchor)
+                cursor.insertText(' ')
+            cursor.endEditBlock()
+        finally:
             self._converting_space = False
     
     def insertFromMimeData(self, source):
@@ -505,25 +710,34 @@ class MacroEditor(QTextEdit):
         if not self.completer or (control_or_alt and not is_shortcut):
             return
 
-        eow = "~!@#$%^&*()_+{}|:\"?,./;'[]\\-="
-        has_modifier = (event.modifiers() != Qt.KeyboardModifier.NoModifier) and not is_shortcut
-        
-        completion_prefix = self.textUnderCursor()
-
-        # "/" や "<" が入力された直後、または文字入力中でプレフィックスがある場合
-        text = event.text()
-        if not is_shortcut and (has_modifier or not text or len(completion_prefix) < 1):
-            # 特定のトリガー文字の場合は補完を開始する
-            if text not in ["/", "<"]:
-                self.completer.popup().hide()
-                return
+        self._update_completion(event.text(), is_shortcut)
 
-        if text in ["/", "<"]:
-             completion_prefix = text
+    def inputMethodEvent(self, event):
+        """IMEで確定した日本語入力でも補完候補を更新する"""
+        super().inputMethodEvent(event)
+        if event.commitString():
+            self._update_completion(event.commitString(), False)
 
-        if completion_prefix != self.completer.completionPrefix():
-            self.completer.setCompletionPrefix(completion_prefix)
-            self.completer.popup().setCurrentIndex(self.completer.completionModel().index(0, 0))
+    def _update_completion(self, text: str, forced: bool):
+        # カーソルより前の行内容から補完の種類を判定する（行頭の / はコマンド、< はターゲット、
+        # /ma " の後は魔法、/ws " の後はWSなど）
+        tc = self.textCursor()
+        context = find_context(tc.block().text()[:tc.positionInBlock()])
+        if context is None or (not forced and not text):
+            self.completer.popup().hide()
+            return
+        # 何も入力していない状態ではトリガー文字の直後か Ctrl+Space のときだけ表示する
+        if not context.prefix and not forced and text not in ('/', '<', '"'):
+            self.completer.popup().hide()
+            return
+
+        candidates = _COMPLETION_INDEX.complete(context)
+        if not candidates:
+            self.completer.popup().hide()
+            return
+        self._completion_context = context
+        self._completion_model.setStringList(candidates)
+        self.completer.popup().setCurrentIndex(self.completer.completionModel().index(0, 0))
 
         cr = self.cursorRect()
         cr.setWidth(self.completer.popup().sizeHintForColumn(0) + self.completer.popup().verticalScrollBar().sizeHint().width())
@@ -27,6 +27,10 @@ _TEXTS = {
         "action_copy": "コピー",
         "action_paste": "ペースト",
         "action_clear": "クリア",
+        "action_undo": "元に戻す",
+        "action_redo": "やり直し",
+        "action_search": "マクロ検索...",
+        "action_replace": "一括置換...",
         
         # 表示メニュー
         "menu_theme": "テーマ",
@@ -58,6 +62,7 @@ _TEXTS = {
         "label_bulk_text": "一括テキスト(6行):",
         "action_import": "FFXIから取り込み",
         "action_autotrans": "定型文リスト...",
+        "action_item_browser": "アイテム定型文...",
         "btn_export_center": "エクスポートセンター",
         
         # 設定ダイアログ
@@ -73,6 +78,8 @@ _TEXTS = {
         # メッセージ
         "msg_save_success": "保存しました。",
         "msg_unsaved_changes": "未保存の変更があります。保存しますか？",
+        "dlg_stale_repo_title": "マクロファイルの競合",
+        "msg_stale_repo": "未保存の変更がありますが、{path} が外部で更新されています。\n\nはい: ファイルから読み直す（未保存の変更は .stale.json に退避）\nいいえ: 未保存の変更を残す（次の保存でファイルを上書き）",
         "msg_lang_changed": "言語設定を変更しました。",
         "msg_lang_changed_with_normalize": "言語設定を変更しました。\n\n定型文の変換: {count} 行",
         "msg_normalize_confirm": "定型文の表記を新しい言語に変換しますか？\n\n例: <<Vallation>> → <<ヴァレション>>\n\n※ 元に戻すにはFFXIから再取り込みが必要です",
@@ -112,6 +119,7 @@ _TEXTS = {
         "dlg_copy_failed": "コピー失敗",
         "msg_copy_failed_permission": "FFXI USER フォルダへの書き込み権限がありません。\n\nProgram Files 配下にインストールされている場合は、\nVanaMacro を「管理者として実行」してから再度お試しください。\n\n詳細: {error}",
         "msg_copy_failed": "FFXI USER フォルダへのコピーに失敗しました。\n\n{error}",
+        "msg_copy_report": "更新: {copied} ファイル / 変更なし: {unchanged} ファイル",
         "msg_select_export_or_run": "コピーするエクスポート結果を選択するか、\n先にエクスポートを実行してください。",
         
         # キャラクター管理
@@ -125,6 +133,8 @@ _TEXTS = {
         # 定型文ダイアログ
         "autotrans_title": "定型文リスト",
         "autotrans_no_data": "定型文データがありません",
+        "item_browser_title": "アイテム定型文",
+        "item_browser_placeholder": "アイテム名で検索 (日本語/英語)",
         "btn_insert": "挿入",
         "btn_close": "閉じる",
         
@@ -140,6 +150,12 @@ Ctrl+I : FFXIから取り込み
 Ctrl+E : エクスポートセンター
 Ctrl+Q : 終了
 
+【編集】
+Ctrl+Z : 元に戻す
+Ctrl+Y : やり直し
+Ctrl+F : マクロ検索
+Ctrl+H : 一括置換
+
 【表示】
 Ctrl+0 : レイアウトをリセット
 
@@ -148,7 +164,8 @@ Ctrl+S : マクロを保存
 Ctrl+Shift+C : マクロをコピー
 Ctrl+Shift+V : マクロをペースト
 Ctrl+Shift+D : マクロをクリア
-Ctrl+T : 定型文リスト""",
+Ctrl+T : 定型文リスト
+Ctrl+Shift+T : アイテム定型文""",
         
         # Bookエリア
         "label_book_rename": "Book名変更",
@@ -171,6 +188,30 @@ Ctrl+T : 定型文リスト""",
         "status_copied": "コピーしました",
         "status_pasted": "ペーストしました",
         "status_cleared": "クリアしました",
+        "status_undone": "元に戻しました",
+        "status_redone": "やり直しました",
+
+        # マクロ検索
+        "search_title": "マクロ検索",
+        "search_placeholder": "マクロ名・本文・定型文を検索",
+        "search_result_count": "{count} 件",
+        "search_no_results": "見つかりませんでした",
+        "search_indexing": "検索用の索引を作成中です…",
+
+        # 一括置換
+        "replace_title": "一括置換",
+        "replace_find": "検索する文字列",
+        "replace_with": "置換後の文字列",
+        "replace_mode_plain": "文字列",
+        "replace_mode_regex": "正規表現",
+        "replace_mode_autotrans": "定型文",
+        "replace_case_sensitive": "大文字と小文字を区別",
+        "replace_include_names": "マクロ名も対象",
+        "replace_preview": "プレビュー",
+        "replace_apply": "すべて置換",
+        "replace_preview_count": "{count} 箇所が置換されます",
+        "replace_applied_count": "{count} 箇所を置換しました",
+        "replace_regex_error": "正規表現が正しくありません:",
         "status_no_selection": "選択されていません",
         
         # ダイアログタイトル
@@ -211,9 +252,17 @@ Ctrl+T : 定型文リスト""",
         "msg_storage_not_available": "storage モジュールが利用できないためコピーできません。",
         "msg_ffxi_folder_not_found": "フォルダが見つかりません:",
         "msg_ffxi_mcr_not_loaded": "ffxi_mcr モジュールを読み込めません。",
-        "msg_ffxi_import_confirm": "FFXIのデータを取り込み、現在のVanaMacro上のデータを上書きします。\n\n編集中のデータは、[エクスポート]処理でバックアップされます。\n\n実行してもよろしいですか？\n",
+        "msg_ffxi_import_confirm": "FFXIのデータを取り込み、現在のVanaMacro上のデータを上書きします。\n\n取り込みは [編集] → [元に戻す] (Ctrl+Z) で取り消せます。\n\n実行してもよろしいですか？\n",
         "msg_ffxi_mcr_not_found": "mcr*.dat が見つからないか、読み込みは失敗しました。",
         "msg_ffxi_import_complete": "FFXIデータの取り込みが完了しました。",
+        "msg_backup_in_progress": "FFXI USER フォルダのバックアップ中です。完了してから再度実行してください。",
+        "status_backup_started": "FFXI USER フォルダをバックアップしています...",
+        "status_backup_progress": "FFXI USER フォルダをバックアップしています... ({done}/{total})",
+        "status_backup_done": "バックアップが完了しました",
+        "status_backup_failed": "バックアップに失敗しました: {error}",
+        "msg_ffxi_merge_up_to_date": "前回の取り込み以降、ゲーム側のマクロに変更はありません。",
+        "msg_ffxi_merge_confirm": "ゲーム側で変更されたマクロ {changes} 件を取り込みます。\nVanaMacro側だけで変更したマクロはそのまま残ります。\n\n取り込みは [編集] → [元に戻す] (Ctrl+Z) で取り消せます。",
+        "msg_ffxi_merge_conflicts": "ゲーム側の変更 {changes} 件は自動で取り込みます。\n次の {conflicts} 件はゲーム側とVanaMacro側の両方で変更されています (VanaMacro / ゲーム):\n\n{details}\n\n[はい] ゲーム側を採用　[いいえ] VanaMacro側を維持　[キャンセル] 中止",
         "dlg_ffxi_import_title": "FFXI取り込み",
         "dlg_complete": "完了",
     },
@@ -237,6 +286,10 @@ Ctrl+T : 定型文リスト""",
         "action_copy": "Copy",
         "action_paste": "Paste",
         "action_clear": "Clear",
+        "action_undo": "Undo",
+        "action_redo": "Redo",
+        "action_search": "Search Macros...",
+        "action_replace": "Find and Replace...",
         
         # View menu
         "menu_theme": "Theme",
@@ -268,6 +321,7 @@ Ctrl+T : 定型文リスト""",
         "label_bulk_text": "Bulk Text (6 lines):",
         "action_import": "Import from FFXI",
         "action_autotrans": "Auto-translate List...",
+        "action_item_browser": "Item Auto-translate...",
         "btn_export_center": "Export Center",
         
         # Settings dialog
@@ -283,6 +337,8 @@ Ctrl+T : 定型文リスト""",
         # Messages
         "msg_save_success": "Saved successfully.",
         "msg_unsaved_changes": "You have unsaved changes. Save them?",
+        "dlg_stale_repo_title": "Macro file conflict",
+        "msg_stale_repo": "There are unsaved changes, but {path} was changed outside the app.\n\nYes: reload from the file (unsaved changes are kept in .stale.json)\nNo: keep the unsaved changes (the next save overwrites the file)",
         "msg_lang_changed": "Language settings changed.",
         "msg_lang_changed_with_normalize": "Language settings changed.\n\nAuto-translate converted: {count} lines",
         "msg_normalize_confirm": "Convert auto-translate text to the new language?\n\nExample: <<ヴァレション>> → <<Vallation>>\n\n※ To revert, re-import from FFXI",
@@ -322,6 +378,7 @@ Ctrl+T : 定型文リスト""",
         "dlg_copy_failed": "Copy Failed",
         "msg_copy_failed_permission": "No write permission for FFXI USER folder.\n\nIf installed under Program Files,\nplease 'Run as Administrator' and try again.\n\nDetails: {error}",
         "msg_copy_failed": "Copy to FFXI USER folder failed.\n\n{error}",
+        "msg_copy_report": "Updated: {copied} file(s) / unchanged: {unchanged} file(s)",
         "msg_select_export_or_run": "Select an export result to copy,\nor run export first.",
         
         # Character Management
@@ -335,6 +392,8 @@ Ctrl+T : 定型文リスト""",
         # Auto-translate Dialog
         "autotrans_title": "Auto-translate List",
         "autotrans_no_data": "No auto-translate data available",
+        "item_browser_title": "Item Auto-translate",
+        "item_browser_placeholder": "Search item names (Japanese/English)",
         "btn_insert": "Insert",
         "btn_close": "Close",
         
@@ -350,6 +409,12 @@ Ctrl+I : Import from FFXI
 Ctrl+E : Export Center
 Ctrl+Q : Exit
 
+[Edit]
+Ctrl+Z : Undo
+Ctrl+Y : Redo
+Ctrl+F : Search Macros
+Ctrl+H : Find and Replace
+
 [View]
 Ctrl+0 : Reset Layout
 
@@ -358,7 +423,8 @@ Ctrl+S : Save Macro
 Ctrl+Shift+C : Copy Macro
 Ctrl+Shift+V : Paste Macro
 Ctrl+Shift+D : Clear Macro
-Ctrl+T : Auto-translate List""",
+Ctrl+T : Auto-translate List
+Ctrl+Shift+T : Item Auto-translate""",
         
         # Book Area
         "label_book_rename": "Rename Book",
@@ -381,6 +447,30 @@ Ctrl+T : Auto-translate List""",
         "status_copied": "Copied",
         "status_pasted": "Pasted",
         "status_cleared": "Cleared",
+        "status_undone": "Undone",
+        "status_redone": "Redone",
+
+        # Macro search
+        "search_title": "Search Macros",
+        "search_placeholder": "Search names, lines and auto-translate text",
+        "search_result_count": "{count} results",
+        "search_no_results": "No matches",
+        "search_indexing": "Building the search index…",
+
+        # Find and replace
+        "replace_title": "Find and Replace",
+        "replace_find": "Find",
+        "replace_with": "Replace with",
+        "replace_mode_plain": "Text",
+        "replace_mode_regex": "Regular expression",
+        "replace_mode_autotrans": "Auto-translate",
+        "replace_case_sensitive": "Match case",
+        "replace_include_names": "Include macro names",
+        "replace_preview": "Preview",
+        "replace_apply": "Replace All",
+        "replace_preview_count": "{count} replacements",
+        "replace_applied_count": "Replaced {count} occurrences",
+        "replace_regex_error": "Invalid regular expression:",
         "status_no_selection": "No selection",
         
         # Dialog Titles
@@ -421,9 +511,17 @@ Ctrl+T : Auto-translate List""",
         "msg_storage_not_available": "Storage module not available. Cannot copy.",
         "msg_ffxi_folder_not_found": "Folder not found:",
         "msg_ffxi_mcr_not_loaded": "Cannot load ffxi_mcr module.",
-        "msg_ffxi_import_confirm": "This will import FFXI data and overwrite the current VanaMacro data.\n\nYour current edits will be backed up via [Export].\n\nDo you want to proceed?\n",
+        "msg_ffxi_import_confirm": "This will import FFXI data and overwrite the current VanaMacro data.\n\nThe import can be reverted with [Edit] → [Undo] (Ctrl+Z).\n\nDo you want to proceed?\n",
         "msg_ffxi_mcr_not_found": "mcr*.dat not found or failed to load.",
         "msg_ffxi_import_complete": "FFXI data import completed.",
+        "msg_backup_in_progress": "The FFXI USER folder is being backed up. Please try again when it has finished.",
+        "status_backup_started": "Backing up the FFXI USER folder...",
+        "status_backup_progress": "Backing up the FFXI USER folder... ({done}/{total})",
+        "status_backup_done": "Backup completed",
+        "status_backup_failed": "Backup failed: {error}",
+        "msg_ffxi_merge_up_to_date": "No macros were changed in game since the last import.",
+        "msg_ffxi_merge_confirm": "{changes} macro(s) changed in game will be imported.\nMacros changed only in VanaMacro are kept.\n\nThe import can be reverted with [Edit] → [Undo] (Ctrl+Z).",
+        "msg_ffxi_merge_conflicts": "{changes} change(s) from the game will be imported automatically.\nThe following {conflicts} item(s) were changed both in game and in VanaMacro (VanaMacro / game):\n\n{details}\n\n[Yes] Use game version   [No] Keep VanaMacro version   [Cancel] Abort",
         "dlg_ffxi_import_title": "FFXI Import",
         "dlg_complete": "Complete",
     }